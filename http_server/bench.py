@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import socket
+import time
+from typing import Self
+
+from server import STATIC_FILES_PATH, Server, ServingMode
+
+PERCENTILES = (50, 90, 99, 99.9)
+SERVER_START_TIMEOUT = 5
+
+
+# HdrHistogram-like layout: power-of-two ranges split into equal linear sub-buckets,
+# relative error is bounded by 2 ** (1 - precision_bits)
+class LatencyHistogram:
+
+    PRECISION_BITS = 8
+
+    def __init__(self, precision_bits: int = PRECISION_BITS) -> None:
+        self._precision_bits = precision_bits
+        self._half_bucket_size = 1 << (precision_bits - 1)
+        self.counts: Counter[int] = Counter()
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        bucket = max(0, value.bit_length() - self._precision_bits)
+        self.counts[bucket * self._half_bucket_size + (value >> bucket)] += 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def merge(self, other: Self) -> None:
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> int:
+        if not self.total:
+            return 0
+        threshold = self.total * percentile / 100
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                # Highest value that falls into the same bucket
+                return min(self._lowest_value(index + 1) - 1, self.max)
+        return self.max
+
+    def _lowest_value(self, index: int) -> int:
+        bucket = max(0, (index >> (self._precision_bits - 1)) - 1)
+        return (index - bucket * self._half_bucket_size) << bucket
+
+
+@dataclass
+class LoadResult:
+
+    requests: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def merge(self, other: Self) -> None:
+        self.requests += other.requests
+        self.errors += other.errors
+        self.elapsed = max(self.elapsed, other.elapsed)
+        self.histogram.merge(other.histogram)
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass(frozen=True)
+class LoadConfig:
+
+    host: str
+    port: int
+    path: str
+    connections: int
+    duration: float
+    requests: int | None
+    keep_alive: bool
+
+    @property
+    def request(self) -> bytes:
+        connection = 'keep-alive' if self.keep_alive else 'close'
+        return f'GET {self.path} HTTP/1.1\r\nHost: {self.host}\r\nConnection: {connection}\r\n\r\n'.encode()
+
+
+class LoadGenerator:
+
+    def __init__(self, config: LoadConfig) -> None:
+        self._config = config
+        self._result = LoadResult()
+        self._remaining = config.requests
+        self._deadline = 0.0
+
+    def run(self) -> LoadResult:
+        return asyncio.run(self._run())
+
+    async def _run(self) -> LoadResult:
+        start = time.perf_counter()
+        self._deadline = time.monotonic() + self._config.duration
+        await asyncio.gather(*(self._connection() for _ in range(self._config.connections)))
+        self._result.elapsed = time.perf_counter() - start
+        return self._result
+
+    def _should_continue(self) -> bool:
+        if self._remaining is not None:
+            self._remaining -= 1
+            return self._remaining >= 0
+        return time.monotonic() < self._deadline
+
+    async def _connection(self) -> None:
+        request = self._config.request
+        writer = None
+        while self._should_continue():
+            try:
+                if writer is None:
+                    start = time.perf_counter()
+                    reader, writer = await asyncio.open_connection(self._config.host, self._config.port)
+                else:
+                    start = time.perf_counter()
+                writer.write(request)
+                head = await reader.readuntil(b'\r\n\r\n')
+                status, content_length, keep_alive = self._parse_head(head)
+                await reader.readexactly(content_length)
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                self._result.errors += 1
+                writer = self._close(writer)
+                continue
+            self._result.histogram.record(int((time.perf_counter() - start) * 1_000_000))
+            if status >= 400:
+                self._result.errors += 1
+            else:
+                self._result.requests += 1
+            if not keep_alive:
+                writer = self._close(writer)
+        self._close(writer)
+
+    @staticmethod
+    def _parse_head(head: bytes) -> tuple[int, int, bool]:
+        status_line, *lines = head.decode('latin-1').split('\r\n')
+        headers = {}
+        for line in lines:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        return int(status_line.split(' ')[1]), int(headers.get('content-length', 0)), keep_alive
+
+    @staticmethod
+    def _close(writer: asyncio.StreamWriter | None) -> None:
+        if writer:
+            writer.close()
+        return None
+
+
+def generate_load(config: LoadConfig) -> LoadResult:
+    return LoadGenerator(config).run()
+
+
+def run_server(mode: ServingMode, port: int, root: Path, workers: int) -> None:
+    Server(port=port, mode=mode, workers=workers, static_files_path=root).start()
+
+
+def wait_for_server(port: int) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while True:
+        try:
+            socket.create_connection(('localhost', port)).close()
+            return
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def find_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+def benchmark(mode: ServingMode, args: argparse.Namespace) -> LoadResult:
+    port = find_free_port()
+    server = multiprocessing.Process(target=run_server, args=(mode, port, args.root, args.workers))
+    server.start()
+    try:
+        wait_for_server(port)
+        configs = [
+            LoadConfig(
+                host='localhost',
+                port=port,
+                path=args.path,
+                connections=len(range(client, args.connections, args.clients)),
+                duration=args.duration,
+                requests=len(range(client, args.requests, args.clients)) if args.requests else None,
+                keep_alive=not args.no_keep_alive,
+            )
+            for client in range(min(args.clients, args.connections))
+        ]
+        result = LoadResult()
+        with multiprocessing.Pool(len(configs)) as pool:
+            for client_result in pool.map(generate_load, configs):
+                result.merge(client_result)
+        return result
+    finally:
+        server.terminate()
+        server.join()
+
+
+def format_latency(microseconds: int) -> str:
+    if microseconds < 1000:
+        return f'{microseconds}us'
+    return f'{microseconds / 1000:.2f}ms'
+
+
+def print_results(results: dict[ServingMode, LoadResult]) -> None:
+    columns = ['mode', 'requests', 'errors', 'rps'] + [f'p{percentile:g}' for percentile in PERCENTILES] + ['max']
+    print(f'{columns[0]:<10}' + ''.join(f'{column:>10}' for column in columns[1:]))
+    for mode, result in results.items():
+        latencies = [result.histogram.percentile(percentile) for percentile in PERCENTILES] + [result.histogram.max]
+        print(
+            f'{mode:<10}{result.requests:>10}{result.errors:>10}{result.rps:>10.0f}'
+            + ''.join(f'{format_latency(latency):>10}' for latency in latencies)
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='HTTP server benchmark', description='Load local HTTP server and measure it')
+    parser.add_argument(
+        '-m', '--modes',
+        nargs='+',
+        type=ServingMode,
+        choices=list(ServingMode),
+        default=list(ServingMode),
+        help='Serving modes to compare',
+    )
+    parser.add_argument('-c', '--connections', type=int, default=100, help='Concurrent connections')
+    parser.add_argument('-d', '--duration', type=float, default=10, help='Seconds to run every mode')
+    parser.add_argument('-n', '--requests', type=int, help='Requests to send to every mode, overrides duration')
+    parser.add_argument('--path', default='/', help='Requested path')
+    parser.add_argument('-r', '--root', type=Path, default=STATIC_FILES_PATH, help='Static files directory')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Server worker processes')
+    parser.add_argument('--clients', type=int, default=os.cpu_count(), help='Load generating processes')
+    parser.add_argument('--no-keep-alive', action='store_true', help='Open a new connection for every request')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    args = parse_args()
+    results = {}
+    for mode in args.modes:
+        print(f'Benchmarking {mode}...', flush=True)
+        results[mode] = benchmark(mode, args)
+    print_results(results)
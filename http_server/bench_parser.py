@@ -0,0 +1,129 @@
+import argparse
+from dataclasses import dataclass
+from functools import cached_property
+import logging
+import timeit
+from typing import Callable
+from urllib.parse import unquote, urlsplit
+
+from server import RequestParser
+
+REQUEST = (
+    b'GET /static/app.js?v=42 HTTP/1.1\r\n'
+    b'Host: localhost:8080\r\n'
+    b'User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0\r\n'
+    b'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8\r\n'
+    b'Accept-Language: en-US,en;q=0.5\r\n'
+    b'Accept-Encoding: gzip, deflate, br\r\n'
+    b'Connection: keep-alive\r\n'
+    b'Referer: http://localhost:8080/index.html\r\n'
+    b'Upgrade-Insecure-Requests: 1\r\n'
+    b'Sec-Fetch-Dest: document\r\n'
+    b'Sec-Fetch-Mode: navigate\r\n'
+    b'Sec-Fetch-Site: same-origin\r\n'
+    b'If-None-Match: "18dfa7e47f5cf6f2-1069"\r\n'
+    b'\r\n'
+)
+LARGE_REQUEST = REQUEST[:-2] + b'Cookie: ' + b'session=0123456789abcdef; ' * 1200 + b'\r\n\r\n'
+LEGACY_REQUEST_TERMINATOR = b'\r\n\r\n'
+
+
+@dataclass(frozen=True)
+class LegacyRequest:
+
+    request: str
+
+    @cached_property
+    def start_line(self) -> str:
+        return self.request.split('\r\n', 1)[0]
+
+    @cached_property
+    def method(self) -> str:
+        return self.start_line.split(' ', 1)[0]
+
+    @cached_property
+    def target(self) -> str:
+        return self.start_line.split(' ')[1]
+
+    @cached_property
+    def path(self) -> str:
+        return unquote(urlsplit(self.target).path)
+
+    @cached_property
+    def headers(self) -> dict[str, str]:
+        headers = {}
+        for line in self.request.split('\r\n')[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return headers
+
+    @cached_property
+    def content_length(self) -> int:
+        return int(self.headers.get('content-length', 0))
+
+
+class LegacyRequestBuffer:
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> None:
+        self._buffer += data
+
+    def pop(self) -> LegacyRequest | None:
+        head_end = self._buffer.find(LEGACY_REQUEST_TERMINATOR)
+        if head_end == -1:
+            return None
+        request = LegacyRequest(bytes(self._buffer[:head_end]).decode('latin-1'))
+        request_end = head_end + len(LEGACY_REQUEST_TERMINATOR) + request.content_length
+        if len(self._buffer) < request_end:
+            return None
+        del self._buffer[:request_end]
+        return request
+
+
+def parse(parser_factory: Callable, chunks: list[bytes]) -> int:
+    parser = parser_factory()
+    parsed = 0
+    for chunk in chunks:
+        parser.feed(chunk)
+        while request := parser.pop():
+            # Fields every request handler reads
+            request.method, request.path, request.headers.get('connection')
+            parsed += 1
+    return parsed
+
+
+def split(data: bytes, size: int) -> list[bytes]:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='Parser benchmark', description='Compare request parsers')
+    parser.add_argument('-n', '--number', type=int, default=10000, help='Runs of every case')
+    return parser.parse_args()
+
+
+def main(number: int) -> None:
+    cases = {
+        'one read': [REQUEST],
+        '16 byte reads': split(REQUEST, 16),
+        '32 pipelined': [REQUEST * 32],
+        '32 pipelined, 1460 byte reads': split(REQUEST * 32, 1460),
+        '30 KiB cookie, 1460 byte reads': split(LARGE_REQUEST, 1460),
+        '30 KiB cookie, 64 byte reads': split(LARGE_REQUEST, 64),
+    }
+    parsers = {'legacy': LegacyRequestBuffer, 'incremental': RequestParser}
+    print(f'{"case":<32}' + ''.join(f'{name:>14}' for name in parsers) + f'{"speedup":>10}')
+    for case, chunks in cases.items():
+        timings = [
+            timeit.timeit(lambda: parse(parser_factory, chunks), number=number) / number * 1e6
+            for parser_factory in parsers.values()
+        ]
+        print(f'{case:<32}' + ''.join(f'{timing:>12.1f}us' for timing in timings) + f'{timings[0] / timings[1]:>9.2f}x')
+
+
+if __name__ == '__main__':
+    logging.disable()
+    args = parse_args()
+    main(args.number)
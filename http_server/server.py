@@ -1,123 +1,1516 @@
-from dataclasses import dataclass
-from functools import cache, cached_property
-from http import HTTPMethod
+import argparse
+import asyncio
+import bisect
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field, replace
+from email.utils import formatdate, parsedate_to_datetime
+from enum import StrEnum
+from functools import cached_property, partial
+import gzip
+from http import HTTPMethod, HTTPStatus
 import logging
+from logging.handlers import QueueHandler
+import mimetypes
+import multiprocessing
+from multiprocessing.connection import wait
+import os
 from pathlib import Path
+import queue
+import secrets
+import selectors
+import signal
 import socket
-import logging
-import socket
+import sys
 import threading
+import time
+from typing import Callable
+from urllib.parse import unquote, urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 STATIC_FILES_PATH = Path('./www')
-INDEX_HTML_PATH = STATIC_FILES_PATH / 'index.html'
+INDEX_FILE_NAME = 'index.html'
+METRICS_PATH = '/__metrics'
+DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+COMPRESSIBLE_CONTENT_TYPES = frozenset([
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+])
+COMPRESS_MIN_SIZE = 256
+RECV_SIZE = 64 * 1024
+
+LOG_FORMAT = '%(asctime)s - %(process)d - %(levelname)s - %(message)s'
+
+
+class ServingMode(StrEnum):
+
+    THREADING = 'threading'
+    SELECTORS = 'selectors'
+    ASYNCIO = 'asyncio'
+
+
+class ContentEncoding(StrEnum):
+
+    BROTLI = 'br'
+    GZIP = 'gzip'
+    IDENTITY = 'identity'
+
+
+# Pre-compressed siblings in the order of preference
+PRECOMPRESSED_SUFFIXES = {ContentEncoding.BROTLI: '.br', ContentEncoding.GZIP: '.gz'}
+COMPRESSORS = {ContentEncoding.GZIP: partial(gzip.compress, compresslevel=9, mtime=0)}
+if brotli:
+    COMPRESSORS[ContentEncoding.BROTLI] = brotli.compress
+
+
+class BadRequest(Exception):
+
+    status = HTTPStatus.BAD_REQUEST
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class RequestHeadersTooLarge(BadRequest):
+
+    status = HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE
 
 
 @dataclass(frozen=True)
 class Request:
 
-    request: str
+    method: str
+    target: str
+    version: str
+    headers: dict[str, str]
+    size: int
+    # Seconds from the first byte of the request to the end of its headers, and spent parsing them
+    read_time: float = 0.0
+    parse_time: float = 0.0
+
+    @cached_property
+    def path(self) -> str:
+        return unquote(urlsplit(self.target).path)
+
+    @cached_property
+    def content_length(self) -> int:
+        try:
+            content_length = int(self.headers.get('content-length', 0))
+        except ValueError:
+            raise BadRequest('Invalid Content-Length')
+        if content_length < 0:
+            raise BadRequest('Invalid Content-Length')
+        return content_length
 
     @cached_property
-    def start_line(self) -> str:
-        return self.request.split('\r\n', 1)[0]
+    def accepted_encodings(self) -> dict[str, float]:
+        encodings = {}
+        for item in self.headers.get('accept-encoding', '').split(','):
+            name, _, parameters = item.partition(';')
+            name = name.strip().lower()
+            if not name:
+                continue
+            quality = 1.0
+            parameters = parameters.strip().lower()
+            if parameters.startswith('q='):
+                try:
+                    quality = float(parameters[2:])
+                except ValueError:
+                    quality = 0.0
+            encodings[name] = quality
+        return encodings
 
     @cached_property
-    def method(self) -> HTTPMethod:
-        return HTTPMethod(self.start_line.split(' ', 1)[0])
+    def byte_ranges(self) -> list[tuple[int | None, int | None]] | None:
+        # Range specs as (first, last) positions, first is None for a suffix range;
+        # None when the header is absent or malformed, such a header is ignored
+        unit, _, specs = self.headers.get('range', '').partition('=')
+        if unit.strip().lower() != 'bytes':
+            return None
+        ranges = []
+        for spec in specs.split(','):
+            first, dash, last = spec.strip().partition('-')
+            # str.isdigit accepts non-ASCII digits like '²' that int rejects
+            values = [value for value in (first, last) if value]
+            if not dash or not values or not all(value.isascii() and value.isdigit() for value in values):
+                return None
+            if first and last and int(last) < int(first):
+                return None
+            ranges.append((int(first) if first else None, int(last) if last else None))
+        return ranges
+
+    @cached_property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.1':
+            return connection != 'close'
+        return connection == 'keep-alive'
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class RequestParser:
+
+    MAX_HEADERS_SIZE = 64 * 1024
+    MAX_HEADERS_COUNT = 100
+
+    def __init__(self, max_headers_size: int = MAX_HEADERS_SIZE, max_headers_count: int = MAX_HEADERS_COUNT) -> None:
+        self._max_headers_size = max_headers_size
+        self._max_headers_count = max_headers_count
+        self._buffer = bytearray()
+        # Start of the current request, consumed bytes are dropped from the buffer once per request
+        self._position = 0
+        # Where the search for the end of headers resumes, so partial reads are not rescanned on every feed
+        self._scanned = 0
+        self._request: Request | None = None
+        self._started: float | None = None
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._buffer)
+
+    def feed(self, data: bytes) -> None:
+        if self._started is None:
+            self._started = time.perf_counter()
+        self._buffer += data
+
+    def pop(self) -> Request | None:
+        if self._request is None and not self._read_head():
+            return None
+        # Body is not used by the allowed methods, but it has to be skipped to find the next pipelined request
+        body_end = self._position + self._request.content_length
+        if len(self._buffer) < body_end:
+            return None
+        request = self._request
+        del self._buffer[:body_end]
+        self._position = self._scanned = 0
+        self._request = None
+        # Bytes of a pipelined request are already received
+        self._started = time.perf_counter() if self._buffer else None
+        return request
+
+    def _read_head(self) -> bool:
+        # Empty lines before a request are allowed
+        while self._buffer.startswith(b'\r\n', self._position):
+            self._position += 2
+        head_end = self._buffer.find(b'\r\n\r\n', max(self._scanned, self._position))
+        if head_end == -1:
+            # Terminator may be split between reads, so its possible beginning is scanned again
+            self._scanned = max(len(self._buffer) - 3, self._position)
+            if len(self._buffer) - self._position > self._max_headers_size:
+                raise RequestHeadersTooLarge('Request headers are too large')
+            return False
+        size = head_end + 4 - self._position
+        if size > self._max_headers_size:
+            raise RequestHeadersTooLarge('Request headers are too large')
+        read_time = time.perf_counter() - self._started
+        self._request = self._parse_head(bytes(self._buffer[self._position:head_end]), size, read_time)
+        self._position = head_end + 4
+        return True
+
+    def _parse_head(self, head: bytes, size: int, read_time: float) -> Request:
+        started = time.perf_counter()
+        # Only the head is decoded, pipelined requests and bodies stay in the byte buffer
+        start_line, *lines = head.decode('latin-1').split('\r\n')
+        if len(lines) > self._max_headers_count:
+            raise RequestHeadersTooLarge('Too many request headers')
+        method, target, version = self._parse_start_line(start_line)
+        headers = {}
+        for line in lines:
+            name, separator, value = line.partition(':')
+            # Empty names and whitespace before the colon are rejected as well
+            if not separator or name[-1:] in ' \t':
+                raise BadRequest(f'Invalid header line: {line!r}')
+            name = name.lower()
+            value = value.strip()
+            if name in headers:
+                value = f'{headers[name]}, {value}'
+            headers[name] = value
+        return Request(method, target, version, headers, size, read_time, time.perf_counter() - started)
+
+    @staticmethod
+    def _parse_start_line(line: str) -> list[str]:
+        parts = line.split(' ')
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise BadRequest(f'Invalid start line: {line!r}')
+        return parts
+
+
+class StaticFile:
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.file = open(path, 'rb', buffering=0)
+        stat = os.fstat(self.file.fileno())
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        content_type, encoding = mimetypes.guess_type(path.name)
+        # Compressed files requested directly are served as is, not as their uncompressed type
+        self.content_type = content_type if content_type and not encoding else DEFAULT_CONTENT_TYPE
+        self.version = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        self.etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.validated_at = time.monotonic()
+
+    def is_modified(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return True
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns) != self.version
+
+    def read(self) -> bytes:
+        return os.pread(self.file.fileno(), self.size, 0)
+
+    def __del__(self) -> None:
+        # Evicted files are closed only when the last response that sends them is released
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+class FileCache:
+
+    MAX_SIZE = 256
+    VALIDITY = 1
+
+    def __init__(self, root: Path, max_size: int = MAX_SIZE, validity: float = VALIDITY) -> None:
+        self._root = root.resolve()
+        self._max_size = max_size
+        self._validity = validity
+        self._files: OrderedDict[str, StaticFile] = OrderedDict()
+        # Missing paths are remembered separately, so lookups of absent files do not evict open ones
+        self._missing: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url_path: str) -> StaticFile | None:
+        with self._lock:
+            static_file = self._files.get(url_path)
+            if static_file:
+                self._files.move_to_end(url_path)
+            missing_since = self._missing.get(url_path)
+        if static_file and not self._is_stale(static_file):
+            return static_file
+        if missing_since is not None and time.monotonic() - missing_since < self._validity:
+            return None
+        static_file = self._open(url_path)
+        with self._lock:
+            if not static_file:
+                self._files.pop(url_path, None)
+                self._missing[url_path] = time.monotonic()
+                self._missing.move_to_end(url_path)
+                while len(self._missing) > self._max_size:
+                    self._missing.popitem(last=False)
+                return None
+            self._missing.pop(url_path, None)
+            self._files[url_path] = static_file
+            self._files.move_to_end(url_path)
+            while len(self._files) > self._max_size:
+                self._files.popitem(last=False)
+        return static_file
+
+    def get_sibling(self, static_file: StaticFile, suffix: str) -> StaticFile | None:
+        return self.get('/' + static_file.path.relative_to(self._root).as_posix() + suffix)
+
+    def _is_stale(self, static_file: StaticFile) -> bool:
+        now = time.monotonic()
+        if now - static_file.validated_at < self._validity:
+            return False
+        if static_file.is_modified():
+            return True
+        static_file.validated_at = now
+        return False
+
+    def _open(self, url_path: str) -> StaticFile | None:
+        # Any path the file system rejects (NUL byte, too long name) is just not found
+        try:
+            path = (self._root / url_path.lstrip('/')).resolve()
+            if not path.is_relative_to(self._root):
+                return None
+            if path.is_dir():
+                path = path / INDEX_FILE_NAME
+            return StaticFile(path)
+        except (OSError, ValueError):
+            return None
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+
+    version: tuple[int, int, int]
+    headers: dict[str, str]
+    body: bytes
 
     def __len__(self) -> int:
-        return len(self.request)
+        return len(self.body) + sum(len(name) + len(value) for name, value in self.headers.items())
+
+
+@dataclass(frozen=True)
+class CacheStats:
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+
+
+class ResponseCache:
+
+    MAX_SIZE = 16 * 1024 * 1024
+    MAX_ITEM_SIZE = 1024 * 1024
+
+    def __init__(self, max_size: int = MAX_SIZE, max_item_size: int = MAX_ITEM_SIZE) -> None:
+        self.max_size = max_size
+        self.max_item_size = min(max_item_size, max_size)
+        self._responses: OrderedDict[tuple[str, str], CachedResponse] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str], version: tuple[int, int, int]) -> CachedResponse | None:
+        with self._lock:
+            response = self._responses.get(key)
+            if not response or response.version != version:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._responses.move_to_end(key)
+            return response
+
+    def put(self, key: tuple[str, str], response: CachedResponse) -> None:
+        if len(response) > self.max_item_size:
+            return
+        with self._lock:
+            if previous := self._responses.pop(key, None):
+                self._size -= len(previous)
+            self._responses[key] = response
+            self._size += len(response)
+            while self._size > self.max_size:
+                _, evicted = self._responses.popitem(last=False)
+                self._size -= len(evicted)
+                self._evictions += 1
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._responses), self._size)
+
+
+@dataclass(frozen=True)
+class FileSegment:
+
+    file: StaticFile
+    offset: int
+    count: int
+
+
+@dataclass(frozen=True)
+class Response:
+
+    status: HTTPStatus
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes | FileSegment | list[bytes | FileSegment] = b''
+    keep_alive: bool = False
+
+    def head(self) -> bytes:
+        lines = [f'HTTP/1.1 {self.status.value} {self.status.phrase}']
+        lines.extend(f'{name}: {value}' for name, value in self.headers.items())
+        lines.append(f'Connection: {"keep-alive" if self.keep_alive else "close"}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    def chunks(self) -> list[bytes | FileSegment]:
+        # Adjacent bytes are joined so that they go out in a single send
+        chunks = [self.head()]
+        for part in self._parts:
+            if isinstance(part, FileSegment):
+                if part.count:
+                    chunks.append(part)
+            elif isinstance(chunks[-1], bytes):
+                chunks[-1] += part
+            else:
+                chunks.append(part)
+        return chunks
+
+    @property
+    def body_size(self) -> int:
+        return sum(len(part) if isinstance(part, bytes) else part.count for part in self._parts)
+
+    @property
+    def _parts(self) -> list[bytes | FileSegment]:
+        return self.body if isinstance(self.body, list) else [self.body]
+
+
+class AccessLogQueueHandler(QueueHandler):
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the writer thread, arguments of access records are immutable
+        return record
+
+
+class AccessLog:
+
+    # Combined log format extended the way log_analyzer expects it
+    FORMAT = (
+        '%(client)s -  - [%(asctime)s] "%(message)s" %(status)d %(size)d "%(referer)s" "%(user_agent)s" '
+        '"-" "-" "-" %(request_time).3f'
+    )
+    DATE_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+    BATCH_SIZE = 512
+    # Escaped as \xHH like nginx does, so a quoted field can not be broken by its value
+    ESCAPES = {code: f'\\x{code:02X}' for code in [*range(0x20), ord('"'), ord('\\'), 0x7f]}
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._queue: queue.SimpleQueue[logging.LogRecord | None] = queue.SimpleQueue()
+        self._formatter = logging.Formatter(self.FORMAT, self.DATE_FORMAT)
+        self._handler = AccessLogQueueHandler(self._queue)
+        self._logger = logging.getLogger('access')
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._file = None
+        self._writer: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._file = open(self._path, 'ab', buffering=0)
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+        self._logger.addHandler(self._handler)
+
+    def stop(self) -> None:
+        self._logger.removeHandler(self._handler)
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
+
+    def log(self, address: tuple[str, int], request: Request, response: Response, request_time: float) -> None:
+        if not self._logger.isEnabledFor(logging.INFO):
+            return
+        self._logger.info(
+            '%s %s %s',
+            self._quote(request.method),
+            self._quote(request.target),
+            self._quote(request.version),
+            extra={
+                'client': address[0],
+                'status': response.status.value,
+                'size': response.body_size,
+                'referer': self._quote(request.headers.get('referer', '-')),
+                'user_agent': self._quote(request.headers.get('user-agent', '-')),
+                'request_time': request_time,
+            },
+        )
+
+    @classmethod
+    def _quote(cls, value: str) -> str:
+        return value.translate(cls.ESCAPES)
+
+    def _write(self) -> None:
+        while True:
+            records = [self._queue.get()]
+            while len(records) < self.BATCH_SIZE and not self._queue.empty():
+                records.append(self._queue.get_nowait())
+            lines = [self._formatter.format(record) + '\n' for record in records if record is not None]
+            # A single write per batch, with O_APPEND batches of worker processes do not interleave
+            self._file.write(''.join(lines).encode())
+            if None in records:
+                return
+
+
+class Histogram:
+
+    BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name: str, description: str, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self._name = name
+        self._description = description
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines = [f'# HELP {self._name} {self._description}', f'# TYPE {self._name} histogram']
+        cumulative = 0
+        for bound, count in zip([f'{bucket:g}' for bucket in self._buckets] + ['+Inf'], counts):
+            cumulative += count
+            lines.append(f'{self._name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self._name}_sum {total}')
+        lines.append(f'{self._name}_count {cumulative}')
+        return lines
+
+
+class Metrics:
+
+    def __init__(self) -> None:
+        self.accept_wait = Histogram('http_accept_wait_seconds', 'Time an accepted connection waits for a thread')
+        self.read = Histogram('http_request_read_seconds', 'Time from the first byte of a request to its last header')
+        self.parse = Histogram('http_request_parse_seconds', 'Time spent parsing request headers')
+        self.build = Histogram('http_response_build_seconds', 'Time spent building a response')
+        self.send = Histogram('http_response_send_seconds', 'Time spent sending a response')
+        self._lock = threading.Lock()
+        self._connections = 0
+        self._connections_total = 0
+        self._sent_bytes_total = 0
+        # Stats of other components, rendered as (prefix, stats getter, names of counter fields)
+        self._collectors: list[tuple[str, Callable[[], object], frozenset[str]]] = []
+
+    def connection_opened(self) -> None:
+        with self._lock:
+            self._connections += 1
+            self._connections_total += 1
+
+    def connection_closed(self) -> None:
+        with self._lock:
+            self._connections -= 1
+
+    def observe_request(self, request: Request, build_time: float) -> None:
+        self.read.observe(request.read_time)
+        self.parse.observe(request.parse_time)
+        self.build.observe(build_time)
+
+    def observe_send(self, send_time: float, sent_bytes: int) -> None:
+        self.send.observe(send_time)
+        self.add_sent_bytes(sent_bytes)
+
+    def add_sent_bytes(self, sent_bytes: int) -> None:
+        with self._lock:
+            self._sent_bytes_total += sent_bytes
+
+    def add_collector(self, prefix: str, stats: Callable[[], object], counters: frozenset[str] = frozenset()) -> None:
+        self._collectors.append((prefix, stats, counters))
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                *self._render_value('http_connections', 'gauge', self._connections),
+                *self._render_value('http_connections_total', 'counter', self._connections_total),
+                *self._render_value('http_sent_bytes_total', 'counter', self._sent_bytes_total),
+            ]
+        lines.extend(self._render_value('http_threads', 'gauge', threading.active_count()))
+        for histogram in (self.accept_wait, self.read, self.parse, self.build, self.send):
+            lines.extend(histogram.render())
+        for prefix, stats, counters in self._collectors:
+            for name, value in asdict(stats()).items():
+                if name in counters:
+                    lines.extend(self._render_value(f'{prefix}_{name}_total', 'counter', value))
+                else:
+                    lines.extend(self._render_value(f'{prefix}_{name}', 'gauge', value))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_value(name: str, metric_type: str, value: float) -> list[str]:
+        return [f'# TYPE {name} {metric_type}', f'{name} {value}']
 
 
 class RequestHandler:
 
     ALLOWED_METHODS = frozenset([HTTPMethod.GET, HTTPMethod.HEAD])
+    KEEP_ALIVE_TIMEOUT = 5
+    MAX_KEEP_ALIVE_REQUESTS = 100
+    RETRY_AFTER = 1
+    MAX_RANGES = 16
+    CACHE_COUNTERS = frozenset(['hits', 'misses', 'evictions'])
 
-    def __init__(self) -> None:
+    def __init__(
+            self,
+            keep_alive_timeout: float = KEEP_ALIVE_TIMEOUT,
+            max_keep_alive_requests: int = MAX_KEEP_ALIVE_REQUESTS,
+            files: FileCache | None = None,
+            responses: ResponseCache | None = None,
+            access_log: AccessLog | None = None,
+            metrics: Metrics | None = None,
+        ) -> None:
+        self._keep_alive_timeout = keep_alive_timeout
+        self._max_keep_alive_requests = max_keep_alive_requests
+        self._files = files or FileCache(STATIC_FILES_PATH)
+        self._responses = responses or ResponseCache()
+        self._access_log = access_log
+        self._metrics = metrics or Metrics()
+        self._metrics.add_collector('http_response_cache', lambda: self._responses.stats, self.CACHE_COUNTERS)
         self._logger = logging.getLogger(self.__class__.__name__)
 
-    def __call__(self, connection: socket.socket, address: tuple[str, int]) -> None:
-        self._logger.info(f'Handle request from {address}')
-        request = self._read_request(connection)
-        self._logger.debug(f'Got request: {len(request)} bytes')
-        if not self._is_method_allowed:
-            self._log_request_handled(address)
+    @property
+    def keep_alive_timeout(self) -> float:
+        return self._keep_alive_timeout
+
+    @property
+    def response_cache(self) -> ResponseCache:
+        return self._responses
+
+    @property
+    def access_log(self) -> AccessLog | None:
+        return self._access_log
+
+    @property
+    def metrics(self) -> Metrics:
+        return self._metrics
+
+    def __call__(self, connection: socket.socket, address: tuple[str, int], accepted_at: float | None = None) -> None:
+        if accepted_at is not None:
+            self._metrics.accept_wait.observe(time.monotonic() - accepted_at)
+        self._metrics.connection_opened()
+        self._logger.debug('Handle connection from %s', address)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection.settimeout(self._keep_alive_timeout)
+        requests = RequestParser()
+        handled = 0
+        try:
+            while True:
+                try:
+                    request = self._read_request(connection, requests)
+                except BadRequest as exception:
+                    self._logger.warning('Bad request from %s: %s', address, exception)
+                    self._send(connection, self.error(exception.status))
+                    break
+                if request is None:
+                    break
+                handled += 1
+                try:
+                    response = self.handle(request, address, keep_alive=self.is_keep_alive_allowed(handled))
+                except Exception:
+                    self._logger.exception('Failed to handle request from %s', address)
+                    response = self.error(HTTPStatus.INTERNAL_SERVER_ERROR)
+                self._send(connection, response)
+                if not response.keep_alive:
+                    break
+        except OSError as exception:
+            self._logger.debug('Connection from %s is broken: %s', address, exception)
+        finally:
+            connection.close()
+            self._metrics.connection_closed()
+            self._logger.debug('Connection from %s closed', address)
+
+    def handle(self, request: Request, address: tuple[str, int], keep_alive: bool = False) -> Response:
+        start = time.perf_counter()
+        response = self._handle(request, keep_alive)
+        self._metrics.observe_request(request, time.perf_counter() - start)
+        if self._access_log:
+            self._access_log.log(address, request, response, time.perf_counter() - start)
+        return response
+
+    def _handle(self, request: Request, keep_alive: bool) -> Response:
+        if request.method not in self.ALLOWED_METHODS:
+            return self.error(HTTPStatus.METHOD_NOT_ALLOWED)
+        keep_alive = keep_alive and request.keep_alive
+        if request.path == METRICS_PATH:
+            return self._build_metrics_response(request, keep_alive)
+        static_file = self._files.get(request.path)
+        if not static_file:
+            return self.error(HTTPStatus.NOT_FOUND, keep_alive)
+        return self._build_response(request, static_file, keep_alive)
+
+    def error(self, status: HTTPStatus, keep_alive: bool = False) -> Response:
+        headers = {'Content-Length': '0'}
+        if status == HTTPStatus.METHOD_NOT_ALLOWED:
+            headers['Allow'] = ', '.join(sorted(self.ALLOWED_METHODS))
+        elif status == HTTPStatus.SERVICE_UNAVAILABLE:
+            headers['Retry-After'] = str(self.RETRY_AFTER)
+        return Response(status, headers, keep_alive=keep_alive)
+
+    def reject(self, connection: socket.socket, address: tuple[str, int]) -> None:
+        self._logger.warning('Rejected connection from %s: server is overloaded', address)
+        try:
+            # Drain the request already received, closing a socket with unread data resets it
+            # and the client may lose the response
+            connection.setblocking(False)
+            try:
+                connection.recv(RECV_SIZE)
+            except BlockingIOError:
+                pass
+            connection.setblocking(True)
+            self._send(connection, self.error(HTTPStatus.SERVICE_UNAVAILABLE))
+            connection.shutdown(socket.SHUT_WR)
+        except OSError as exception:
+            self._logger.debug('Connection from %s is broken: %s', address, exception)
+        finally:
             connection.close()
-            return
-        response = self._build_response()
-        self._logger.debug('Sending response')
-        connection.send(response)
-        self._logger.debug('Response is sent')
-        self._logger.debug('Closing connection')
-        connection.close()
-        self._logger.debug('Connection closed')
-        self._log_request_handled(address)
-
-    def _read_request(self, connection: socket.socket) -> Request:
-        request = connection.recv(1024)
-        request = request.decode()
-        return Request(request)
-
-    def _is_method_allowed(self, request: Request) -> bool:
-        return request.method in self.ALLOWED_METHODS
-    
-    def _log_request_handled(self, address: tuple[str, int]) -> None:
-        self._logger.info(f'Request from {address} handled')
 
-    @staticmethod
-    @cache
-    def _build_response() -> bytes:
-        response = b''
-        response += b'HTTP/1.1 200 OK\r\n'
-        response += b'Content-Type: text/html\r\n\r\n'
-        response += INDEX_HTML_PATH.read_bytes()
+    def is_keep_alive_allowed(self, handled: int) -> bool:
+        return handled < self._max_keep_alive_requests
+
+    def _read_request(self, connection: socket.socket, requests: RequestParser) -> Request | None:
+        while (request := requests.pop()) is None:
+            try:
+                data = connection.recv(RECV_SIZE)
+            except TimeoutError:
+                return None
+            if not data:
+                return None
+            requests.feed(data)
+        return request
+
+    def _send(self, connection: socket.socket, response: Response) -> None:
+        start = time.perf_counter()
+        sent_bytes = 0
+        for chunk in response.chunks():
+            if isinstance(chunk, bytes):
+                connection.sendall(chunk)
+                sent_bytes += len(chunk)
+                continue
+            sent = connection.sendfile(chunk.file.file, chunk.offset, chunk.count)
+            sent_bytes += sent
+            if sent != chunk.count:
+                raise ConnectionError(f'File {chunk.file.path} is truncated while sending')
+        self._metrics.observe_send(time.perf_counter() - start, sent_bytes)
+
+    def _build_metrics_response(self, request: Request, keep_alive: bool) -> Response:
+        body = self._metrics.render().encode()
+        headers = {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8', 'Content-Length': str(len(body))}
+        return Response(HTTPStatus.OK, headers, body if request.method == HTTPMethod.GET else b'', keep_alive)
+
+    def _build_response(self, request: Request, static_file: StaticFile, keep_alive: bool) -> Response:
+        variants = self._get_variants(static_file)
+        encoding = self._select_encoding(request, variants)
+        variant = variants.get(encoding, static_file)
+        headers = {'Content-Type': static_file.content_type}
+        if encoding != ContentEncoding.IDENTITY:
+            headers['Content-Encoding'] = encoding
+        if variants:
+            headers['Vary'] = 'Accept-Encoding'
+        headers['ETag'] = variant.etag if variant else f'{static_file.etag[:-1]}-{encoding}"'
+        headers['Last-Modified'] = static_file.last_modified
+        headers['Accept-Ranges'] = 'bytes'
+        if self._is_not_modified(request, headers['ETag'], static_file):
+            headers.pop('Content-Type')
+            headers.pop('Content-Encoding', None)
+            headers.pop('Accept-Ranges')
+            return Response(HTTPStatus.NOT_MODIFIED, headers, keep_alive=keep_alive)
+        if variant and variant.size > self._responses.max_item_size:
+            headers['Content-Length'] = str(variant.size)
+            body = FileSegment(variant, 0, variant.size)
+        else:
+            cached = self._get_cached_response(request.path, static_file, variant, encoding, headers)
+            headers, body = cached.headers, cached.body
+        if request.method != HTTPMethod.GET:
+            return Response(HTTPStatus.OK, headers, keep_alive=keep_alive)
+        if request.byte_ranges is None or not self._is_range_fresh(request, headers):
+            return Response(HTTPStatus.OK, headers, body, keep_alive)
+        return self._build_partial_response(request, headers, body, keep_alive)
+
+    def _build_partial_response(
+            self,
+            request: Request,
+            headers: dict[str, str],
+            body: bytes | FileSegment,
+            keep_alive: bool,
+        ) -> Response:
+        size = len(body) if isinstance(body, bytes) else body.count
+        ranges = self._resolve_ranges(request.byte_ranges, size)
+        if len(ranges) > self.MAX_RANGES:
+            return Response(HTTPStatus.OK, headers, body, keep_alive)
+        if not ranges:
+            headers = {'Content-Range': f'bytes */{size}', 'Content-Length': '0'}
+            return Response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, headers, keep_alive=keep_alive)
+        # Cached headers are shared between responses
+        headers = dict(headers)
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+            headers['Content-Length'] = str(end - start + 1)
+            return Response(HTTPStatus.PARTIAL_CONTENT, headers, self._slice(body, start, end), keep_alive)
+        boundary = secrets.token_hex(16)
+        parts = []
+        for start, end in ranges:
+            part_head = f'Content-Type: {headers["Content-Type"]}\r\nContent-Range: bytes {start}-{end}/{size}'
+            parts.append(f'\r\n--{boundary}\r\n{part_head}\r\n\r\n'.encode('latin-1'))
+            parts.append(self._slice(body, start, end))
+        parts.append(f'\r\n--{boundary}--\r\n'.encode('latin-1'))
+        headers['Content-Type'] = f'multipart/byteranges; boundary={boundary}'
+        response = Response(HTTPStatus.PARTIAL_CONTENT, headers, parts, keep_alive)
+        headers['Content-Length'] = str(response.body_size)
         return response
 
+    @staticmethod
+    def _resolve_ranges(byte_ranges: list[tuple[int | None, int | None]], size: int) -> list[tuple[int, int]]:
+        ranges = []
+        for first, last in byte_ranges:
+            if first is None:
+                if last:
+                    ranges.append((max(size - last, 0), size - 1))
+            elif first < size:
+                ranges.append((first, size - 1 if last is None else min(last, size - 1)))
+        return ranges
+
+    @staticmethod
+    def _slice(body: bytes | FileSegment, start: int, end: int) -> bytes | FileSegment:
+        # File ranges stay segments, so every range is sent with sendfile at its offset
+        if isinstance(body, bytes):
+            return body[start:end + 1]
+        return FileSegment(body.file, body.offset + start, end - start + 1)
+
+    @staticmethod
+    def _is_range_fresh(request: Request, headers: dict[str, str]) -> bool:
+        if_range = request.headers.get('if-range')
+        if if_range is None:
+            return True
+        if if_range.startswith('"'):
+            return if_range == headers['ETag']
+        return if_range == headers['Last-Modified']
+
+    def _get_cached_response(
+            self,
+            path: str,
+            static_file: StaticFile,
+            variant: StaticFile | None,
+            encoding: ContentEncoding,
+            headers: dict[str, str],
+        ) -> CachedResponse:
+        key = (path, encoding)
+        version = variant.version if variant else static_file.version
+        if cached := self._responses.get(key, version):
+            return cached
+        body = variant.read() if variant else COMPRESSORS[encoding](static_file.read())
+        headers['Content-Length'] = str(len(body))
+        cached = CachedResponse(version, headers, body)
+        self._responses.put(key, cached)
+        return cached
+
+    def _get_variants(self, static_file: StaticFile) -> dict[ContentEncoding, StaticFile | None]:
+        # None stands for a variant that is compressed on the fly and kept in the response cache
+        variants = {}
+        if not self._is_compressible(static_file):
+            return variants
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+            sibling = self._files.get_sibling(static_file, suffix)
+            if sibling and sibling.mtime >= static_file.mtime:
+                variants[encoding] = sibling
+            elif encoding in COMPRESSORS and COMPRESS_MIN_SIZE <= static_file.size <= self._responses.max_item_size:
+                variants[encoding] = None
+        return variants
+
+    def _select_encoding(self, request: Request, variants: dict[ContentEncoding, StaticFile | None]) -> ContentEncoding:
+        accepted = request.accepted_encodings
+        selected, selected_quality = ContentEncoding.IDENTITY, 0.0
+        for encoding in variants:
+            quality = accepted.get(encoding, accepted.get('*', 0.0))
+            if quality > selected_quality:
+                selected, selected_quality = encoding, quality
+        return selected
+
+    @staticmethod
+    def _is_compressible(static_file: StaticFile) -> bool:
+        content_type = static_file.content_type
+        return content_type.startswith('text/') or content_type in COMPRESSIBLE_CONTENT_TYPES
+
+    def _is_not_modified(self, request: Request, etag: str, static_file: StaticFile) -> bool:
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is not None:
+            etags = {value.strip().removeprefix('W/') for value in if_none_match.split(',')}
+            return '*' in etags or etag in etags
+        if_modified_since = request.headers.get('if-modified-since')
+        if if_modified_since is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(static_file.mtime) <= since.timestamp()
+
+
+@dataclass
+class ConnectionState:
+
+    connection: socket.socket
+    address: tuple[str, int]
+    requests: RequestParser = field(default_factory=RequestParser)
+    out_queue: deque[bytearray | FileSegment] = field(default_factory=deque)
+    handled: int = 0
+    closing: bool = False
+    last_activity: float = field(default_factory=time.monotonic)
+    # Since when the output queue is not empty and how much of it is sent
+    send_started: float = 0.0
+    sent_bytes: int = 0
+
+
+class SelectorLoop:
+
+    IDLE_CHECK_INTERVAL = 1
+
+    def __init__(self, listen_socket: socket.socket, handler: RequestHandler) -> None:
+        self._listen_socket = listen_socket
+        self._handler = handler
+        self._selector = selectors.DefaultSelector()
+        # Ordered by last activity, so idle connections are always at the beginning
+        self._connections: OrderedDict[int, ConnectionState] = OrderedDict()
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def run(self) -> None:
+        self._listen_socket.setblocking(False)
+        self._selector.register(self._listen_socket, selectors.EVENT_READ)
+        try:
+            while True:
+                for key, events in self._selector.select(timeout=self.IDLE_CHECK_INTERVAL):
+                    if key.data is None:
+                        self._accept()
+                    else:
+                        self._serve(key.data, events)
+                self._close_idle()
+        finally:
+            for state in self._connections.values():
+                state.connection.close()
+            self._selector.close()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                connection, address = self._listen_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            self._logger.debug('Got connection: %s', address)
+            connection.setblocking(False)
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            state = ConnectionState(connection, address)
+            self._selector.register(connection, selectors.EVENT_READ, state)
+            self._connections[connection.fileno()] = state
+            self._handler.metrics.connection_opened()
+
+    def _serve(self, state: ConnectionState, events: int) -> None:
+        # A failure on one connection must not stop the loop serving all the others
+        try:
+            if events & selectors.EVENT_READ:
+                self._read(state)
+            elif events & selectors.EVENT_WRITE:
+                self._write(state)
+        except Exception:
+            self._logger.exception('Failed to serve connection from %s', state.address)
+            if self._connections.get(state.connection.fileno()) is state:
+                self._close(state)
+
+    def _read(self, state: ConnectionState) -> None:
+        try:
+            data = state.connection.recv(RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._close(state)
+            return
+        if not data:
+            self._close(state)
+            return
+        self._touch(state)
+        state.requests.feed(data)
+        self._process(state)
+
+    def _process(self, state: ConnectionState) -> None:
+        # Responses to all pipelined requests are queued at once and sent in the order of requests
+        while not state.closing:
+            try:
+                request = state.requests.pop()
+            except BadRequest as exception:
+                self._logger.warning('Bad request from %s: %s', state.address, exception)
+                response = self._handler.error(exception.status)
+            else:
+                if request is None:
+                    break
+                state.handled += 1
+                keep_alive = self._handler.is_keep_alive_allowed(state.handled)
+                try:
+                    response = self._handler.handle(request, state.address, keep_alive=keep_alive)
+                except Exception:
+                    self._logger.exception('Failed to handle request from %s', state.address)
+                    response = self._handler.error(HTTPStatus.INTERNAL_SERVER_ERROR)
+            self._queue(state, response)
+            state.closing = not response.keep_alive
+        if state.out_queue:
+            self._selector.modify(state.connection, selectors.EVENT_WRITE, state)
+
+    def _queue(self, state: ConnectionState, response: Response) -> None:
+        if not state.out_queue:
+            state.send_started = time.perf_counter()
+        for chunk in response.chunks():
+            if isinstance(chunk, FileSegment):
+                state.out_queue.append(chunk)
+            elif state.out_queue and isinstance(state.out_queue[-1], bytearray):
+                state.out_queue[-1] += chunk
+            else:
+                state.out_queue.append(bytearray(chunk))
+
+    def _write(self, state: ConnectionState) -> None:
+        try:
+            while state.out_queue:
+                self._write_chunk(state)
+        except (BlockingIOError, InterruptedError):
+            self._touch(state)
+            return
+        except OSError:
+            self._close(state)
+            return
+        self._handler.metrics.observe_send(time.perf_counter() - state.send_started, state.sent_bytes)
+        state.sent_bytes = 0
+        self._touch(state)
+        if state.closing:
+            self._close(state)
+        else:
+            self._selector.modify(state.connection, selectors.EVENT_READ, state)
+
+    def _write_chunk(self, state: ConnectionState) -> None:
+        chunk = state.out_queue[0]
+        if isinstance(chunk, bytearray):
+            sent = state.connection.send(chunk)
+            state.sent_bytes += sent
+            del chunk[:sent]
+            if not chunk:
+                state.out_queue.popleft()
+            return
+        sent = os.sendfile(state.connection.fileno(), chunk.file.file.fileno(), chunk.offset, chunk.count)
+        if not sent:
+            raise ConnectionError(f'File {chunk.file.path} is truncated while sending')
+        state.sent_bytes += sent
+        if sent == chunk.count:
+            state.out_queue.popleft()
+        else:
+            state.out_queue[0] = replace(chunk, offset=chunk.offset + sent, count=chunk.count - sent)
+
+    def _touch(self, state: ConnectionState) -> None:
+        state.last_activity = time.monotonic()
+        self._connections.move_to_end(state.connection.fileno())
+
+    def _close_idle(self) -> None:
+        deadline = time.monotonic() - self._handler.keep_alive_timeout
+        while self._connections:
+            state = next(iter(self._connections.values()))
+            if state.last_activity > deadline:
+                break
+            self._logger.debug('Connection from %s is idle', state.address)
+            self._close(state)
+
+    def _close(self, state: ConnectionState) -> None:
+        del self._connections[state.connection.fileno()]
+        self._selector.unregister(state.connection)
+        state.connection.close()
+        self._handler.metrics.add_sent_bytes(state.sent_bytes)
+        self._handler.metrics.connection_closed()
+        self._logger.debug('Connection from %s closed', state.address)
+
+
+class HttpProtocol(asyncio.Protocol):
+
+    def __init__(self, handler: RequestHandler, connections: set['HttpProtocol']) -> None:
+        self._handler = handler
+        self._connections = connections
+        self._parser = RequestParser()
+        self._transport: asyncio.Transport | None = None
+        self._address: tuple[str, int] | None = None
+        self._handled = 0
+        # No more requests are read, the connection is closed once queued responses are written
+        self._closing = False
+        self._shutting_down = False
+        self._writing_paused = False
+        self._sending: asyncio.Task | None = None
+        self._last_activity = 0.0
+        self._last_write_buffer_size = 0
+        self._idle_timer: asyncio.TimerHandle | None = None
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self._transport = transport
+        self._address = transport.get_extra_info('peername')
+        self._logger.debug('Got connection: %s', self._address)
+        self._connections.add(self)
+        self._handler.metrics.connection_opened()
+        self._touch()
+        self._schedule_idle_check(self._handler.keep_alive_timeout)
+
+    def connection_lost(self, exception: Exception | None) -> None:
+        self._connections.discard(self)
+        self._handler.metrics.connection_closed()
+        if self._idle_timer:
+            self._idle_timer.cancel()
+        if self._sending:
+            self._sending.cancel()
+        self._logger.debug('Connection from %s closed', self._address)
+
+    def data_received(self, data: bytes) -> None:
+        self._touch()
+        self._parser.feed(data)
+        self._process()
+
+    def pause_writing(self) -> None:
+        # Client reads slower than we respond, so pipelined requests wait until the write buffer drains
+        self._writing_paused = True
+        self._transport.pause_reading()
+
+    def resume_writing(self) -> None:
+        self._writing_paused = False
+        self._transport.resume_reading()
+        self._process()
+
+    def shutdown(self) -> None:
+        self._shutting_down = True
+        if not self._sending and not self._parser.pending:
+            self._transport.close()
+
+    def abort(self) -> None:
+        self._transport.abort()
+
+    def _process(self) -> None:
+        while not (self._closing or self._writing_paused or self._sending):
+            try:
+                request = self._parser.pop()
+            except BadRequest as exception:
+                self._logger.warning('Bad request from %s: %s', self._address, exception)
+                response = self._handler.error(exception.status)
+            else:
+                if request is None:
+                    break
+                self._handled += 1
+                keep_alive = self._handler.is_keep_alive_allowed(self._handled) and not self._shutting_down
+                try:
+                    response = self._handler.handle(request, self._address, keep_alive=keep_alive)
+                except Exception:
+                    self._logger.exception('Failed to handle request from %s', self._address)
+                    response = self._handler.error(HTTPStatus.INTERNAL_SERVER_ERROR)
+            self._closing = not response.keep_alive
+            self._write(response)
+        if self._sending:
+            return
+        if self._closing or (self._shutting_down and not self._parser.pending):
+            # Buffered responses are flushed before the transport is closed
+            self._transport.close()
+
+    def _write(self, response: Response) -> None:
+        chunks = response.chunks()
+        if all(isinstance(chunk, bytes) for chunk in chunks):
+            # The transport writes to the socket right away and buffers the rest
+            start = time.perf_counter()
+            self._transport.writelines(chunks)
+            self._handler.metrics.observe_send(time.perf_counter() - start, sum(map(len, chunks)))
+            return
+        self._sending = asyncio.get_running_loop().create_task(self._send(chunks))
+
+    async def _send(self, chunks: list[bytes | FileSegment]) -> None:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        sent_bytes = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, bytes):
+                    self._transport.write(chunk)
+                    sent_bytes += len(chunk)
+                    continue
+                # Waits until the write buffer is flushed, then uses os.sendfile where the transport supports it
+                sent = await loop.sendfile(self._transport, chunk.file.file, chunk.offset, chunk.count)
+                sent_bytes += sent
+                if sent != chunk.count:
+                    raise ConnectionError(f'File {chunk.file.path} is truncated while sending')
+        except (ConnectionError, OSError, RuntimeError) as exception:
+            self._logger.debug('Connection from %s is broken: %s', self._address, exception)
+            self._transport.abort()
+            return
+        self._handler.metrics.observe_send(time.perf_counter() - start, sent_bytes)
+        self._sending = None
+        self._touch()
+        self._process()
+
+    def _touch(self) -> None:
+        self._last_activity = asyncio.get_running_loop().time()
+
+    def _schedule_idle_check(self, delay: float) -> None:
+        self._idle_timer = asyncio.get_running_loop().call_later(delay, self._check_idle)
+
+    def _check_idle(self) -> None:
+        timeout = self._handler.keep_alive_timeout
+        write_buffer_size = self._transport.get_write_buffer_size()
+        if self._sending or write_buffer_size != self._last_write_buffer_size:
+            self._last_write_buffer_size = write_buffer_size
+            self._touch()
+        idle = asyncio.get_running_loop().time() - self._last_activity
+        if idle < timeout:
+            self._schedule_idle_check(timeout - idle)
+            return
+        self._logger.debug('Connection from %s is idle', self._address)
+        if write_buffer_size:
+            self._transport.abort()
+        else:
+            self._transport.close()
+
+
+class AsyncLoop:
+
+    SHUTDOWN_TIMEOUT = 10
+    SHUTDOWN_CHECK_INTERVAL = 0.05
+
+    def __init__(self, listen_socket: socket.socket, handler: RequestHandler, backlog: int) -> None:
+        self._listen_socket = listen_socket
+        self._handler = handler
+        self._backlog = backlog
+        self._connections: set[HttpProtocol] = set()
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def run(self) -> None:
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop if uvloop else None) as runner:
+            runner.run(self._serve())
+
+    async def _serve(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._logger.info(f'Event loop: {type(loop).__module__}.{type(loop).__name__}')
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        server = await loop.create_server(
+            lambda: HttpProtocol(self._handler, self._connections),
+            sock=self._listen_socket,
+            backlog=self._backlog,
+        )
+        await stop.wait()
+        server.close()
+        await self._drain()
+
+    async def _drain(self) -> None:
+        self._logger.info(f'Shutting down, connections to drain: {len(self._connections)}')
+        for connection in list(self._connections):
+            connection.shutdown()
+        deadline = asyncio.get_running_loop().time() + self.SHUTDOWN_TIMEOUT
+        while self._connections and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(self.SHUTDOWN_CHECK_INTERVAL)
+        if self._connections:
+            self._logger.warning(f'Aborting connections not drained in time: {len(self._connections)}')
+            for connection in list(self._connections):
+                connection.abort()
+            # Lets transports run connection_lost callbacks before the loop is closed
+            await asyncio.sleep(0)
+
+
+@dataclass(frozen=True)
+class PoolStats:
+
+    threads: int
+    queue_depth: int
+    max_queue_depth: int
+    submitted: int
+    rejected: int
+    average_wait: float
+    max_wait: float
+
+
+class WorkerPool:
+
+    QUEUE_SIZE = 128
+
+    def __init__(self, handler: RequestHandler, threads: int, queue_size: int = QUEUE_SIZE) -> None:
+        self._handler = handler
+        self._queue: queue.Queue[tuple[socket.socket, tuple[str, int], float]] = queue.Queue(queue_size)
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(threads)]
+        self._lock = threading.Lock()
+        self._max_queue_depth = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._started = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._logger = logging.getLogger(self.__class__.__name__)
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def stats(self) -> PoolStats:
+        with self._lock:
+            return PoolStats(
+                threads=len(self._threads),
+                queue_depth=self._queue.qsize(),
+                max_queue_depth=self._max_queue_depth,
+                submitted=self._submitted,
+                rejected=self._rejected,
+                average_wait=self._total_wait / self._started if self._started else 0.0,
+                max_wait=self._max_wait,
+            )
+
+    def submit(self, connection: socket.socket, address: tuple[str, int]) -> bool:
+        try:
+            self._queue.put_nowait((connection, address, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            return False
+        with self._lock:
+            self._submitted += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return True
+
+    def _work(self) -> None:
+        while True:
+            connection, address, queued_at = self._queue.get()
+            wait_time = time.monotonic() - queued_at
+            with self._lock:
+                self._started += 1
+                self._total_wait += wait_time
+                self._max_wait = max(self._max_wait, wait_time)
+            # The thread must outlive any failure, otherwise the pool shrinks until requests are never taken
+            try:
+                self._handler(connection, address, queued_at)
+            except Exception:
+                self._logger.exception('Failed to handle connection from %s', address)
+
 
 class Server:
 
-    LISTEN_BACKLOG = 1
+    LISTEN_BACKLOG = socket.SOMAXCONN
     CLEAN_THREADS_TRIGGER_COUNTER = 1000
+    WORKER_RESTART_DELAY = 1
+    POOL_COUNTERS = frozenset(['submitted', 'rejected'])
 
-    def __init__(self, host: str = 'localhost', port: int = 8080) -> None:
+    def __init__(
+            self,
+            host: str = 'localhost',
+            port: int = 8080,
+            mode: ServingMode = ServingMode.THREADING,
+            workers: int = 1,
+            backlog: int = LISTEN_BACKLOG,
+            reuse_port: bool = False,
+            keep_alive_timeout: float = RequestHandler.KEEP_ALIVE_TIMEOUT,
+            max_keep_alive_requests: int = RequestHandler.MAX_KEEP_ALIVE_REQUESTS,
+            static_files_path: Path = STATIC_FILES_PATH,
+            response_cache_size: int = ResponseCache.MAX_SIZE,
+            threads: int | None = None,
+            queue_size: int = WorkerPool.QUEUE_SIZE,
+            access_log_path: Path | None = None,
+        ) -> None:
+        if workers < 1:
+            raise ValueError(f'Workers number must be positive, got {workers}')
+        if threads is not None and threads < 1:
+            raise ValueError(f'Threads number must be positive, got {threads}')
+        if queue_size < 1:
+            raise ValueError(f'Queue size must be positive, got {queue_size}')
         self._host = host
         self._port = port
+        self._mode = mode
+        self._workers = workers
+        self._backlog = backlog
+        self._reuse_port = reuse_port
+        self._threads = threads
+        self._queue_size = queue_size
+        self._handler = RequestHandler(
+            keep_alive_timeout,
+            max_keep_alive_requests,
+            FileCache(static_files_path),
+            ResponseCache(response_cache_size),
+            AccessLog(access_log_path) if access_log_path else None,
+        )
         self._logger = logging.getLogger(self.__class__.__name__)
         self._socket: socket.socket | None = None
+        self._pool: WorkerPool | None = None
         self._request_threads = []
         self._requests_counter = 0
 
     def _init_socket(self) -> None:
         self._socket = socket.socket()
         self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self._reuse_port:
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self._socket.bind((self._host, self._port))
-        self._socket.listen(self.LISTEN_BACKLOG)
-    
+        self._socket.listen(self._backlog)
+
     def start(self) -> None:
-        self._logger.info('Starting HTTP server')
-        self._init_socket()
+        self._logger.info(f'Starting HTTP server in {self._mode} mode, workers: {self._workers}')
+        if self._workers == 1:
+            self._init_socket()
+            self._log_started()
+            self._serve()
+            return
+        # Without SO_REUSEPORT workers share the listening socket inherited through fork,
+        # with it every worker binds its own socket and the kernel balances connections
+        if not self._reuse_port:
+            self._init_socket()
+        self._log_started()
+        try:
+            self._supervise()
+        finally:
+            if self._socket:
+                self._socket.close()
+
+    def _log_started(self) -> None:
         self._logger.info(f'HTTP server started: {self._host}:{self._port}')
         self._logger.info('Ctrl-C to stop server')
+
+    def _serve(self) -> None:
+        # The writer thread is started in the serving process, threads do not survive fork
+        if self._handler.access_log:
+            self._handler.access_log.start()
         try:
-            self._loop()
+            if self._mode == ServingMode.SELECTORS:
+                SelectorLoop(self._socket, self._handler).run()
+            elif self._mode == ServingMode.ASYNCIO:
+                AsyncLoop(self._socket, self._handler, self._backlog).run()
+            else:
+                if self._threads:
+                    self._pool = WorkerPool(self._handler, self._threads, self._queue_size)
+                    self._handler.metrics.add_collector('http_worker_pool', lambda: self._pool.stats, self.POOL_COUNTERS)
+                self._loop()
         finally:
             self._socket.close()
-    
+            self._logger.info(f'Response cache: {self._handler.response_cache.stats}')
+            if self._pool:
+                self._logger.info(f'Worker pool: {self._pool.stats}')
+            if self._handler.access_log:
+                self._handler.access_log.stop()
+
+    def _supervise(self) -> None:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        context = multiprocessing.get_context('fork')
+        workers = [self._spawn_worker(context) for _ in range(self._workers)]
+        try:
+            while True:
+                wait([worker.sentinel for worker in workers])
+                for index, worker in enumerate(workers):
+                    if worker.is_alive():
+                        continue
+                    self._logger.warning(f'Worker {worker.pid} exited with code {worker.exitcode}, restarting')
+                    time.sleep(self.WORKER_RESTART_DELAY)
+                    workers[index] = self._spawn_worker(context)
+        finally:
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.join()
+
+    def _spawn_worker(self, context: multiprocessing.context.BaseContext) -> multiprocessing.Process:
+        worker = context.Process(target=self._run_worker, daemon=True)
+        worker.start()
+        self._logger.info(f'Worker {worker.pid} started')
+        return worker
+
+    def _run_worker(self) -> None:
+        if self._reuse_port:
+            self._init_socket()
+        try:
+            self._serve()
+        except KeyboardInterrupt:
+            pass
+
     def _loop(self) -> None:
         while True:
-            self._logger.debug('Waiting for connection')
             connection, address = self._socket.accept()
-            self._logger.debug(f'Got connection: {address}')
+            self._logger.debug('Got connection: %s', address)
             self._handle_in_thread(connection, address)
             self._requests_counter += 1
             self._clean_threads()
 
     def _handle_in_thread(self, connection: socket.socket, address: tuple[str, int]) -> None:
+        if self._pool:
+            if not self._pool.submit(connection, address):
+                self._handler.reject(connection, address)
+            return
         request_thread = threading.Thread(
-            target=RequestHandler(), 
-            args=(connection, address),
+            target=self._handler,
+            args=(connection, address, time.monotonic()),
             daemon=True,
         )
         request_thread.start()
@@ -129,5 +1522,75 @@ class Server:
             self._requests_counter = 0
 
 
+class AsyncServer(Server):
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, mode=ServingMode.ASYNCIO, **kwargs)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='HTTP server', description='Serve static files over HTTP')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('-p', '--port', type=int, default=8080)
+    parser.add_argument('-r', '--root', type=Path, default=STATIC_FILES_PATH, help='Static files directory')
+    parser.add_argument(
+        '--response-cache-size',
+        type=int,
+        default=ResponseCache.MAX_SIZE,
+        help='Bytes of rendered responses kept in memory',
+    )
+    parser.add_argument('-m', '--mode', type=ServingMode, choices=list(ServingMode), default=ServingMode.THREADING)
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Number of pre-forked worker processes')
+    parser.add_argument('-b', '--backlog', type=int, default=Server.LISTEN_BACKLOG, help='Listen queue size')
+    parser.add_argument('--reuse-port', action='store_true', help='Bind a socket per worker with SO_REUSEPORT')
+    parser.add_argument(
+        '--keep-alive-timeout',
+        type=float,
+        default=RequestHandler.KEEP_ALIVE_TIMEOUT,
+        help='Seconds an idle keep-alive connection is kept open',
+    )
+    parser.add_argument(
+        '--max-keep-alive-requests',
+        type=int,
+        default=RequestHandler.MAX_KEEP_ALIVE_REQUESTS,
+        help='Requests served over one connection before it is closed',
+    )
+    parser.add_argument(
+        '-t', '--threads',
+        type=int,
+        help='Size of the worker thread pool in threading mode, a thread per connection if not set',
+    )
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=WorkerPool.QUEUE_SIZE,
+        help='Connections waiting for a pool thread before new ones are rejected with 503',
+    )
+    parser.add_argument('--access-log', type=Path, help='File to append access log in combined format to')
+    parser.add_argument(
+        '--log-level',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+        default='INFO',
+        help='Level of the application log written to stderr',
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    Server().start()
+    args = parse_args()
+    logging.basicConfig(level=args.log_level, format=LOG_FORMAT)
+    Server(
+        host=args.host,
+        port=args.port,
+        mode=args.mode,
+        workers=args.workers,
+        backlog=args.backlog,
+        reuse_port=args.reuse_port,
+        keep_alive_timeout=args.keep_alive_timeout,
+        max_keep_alive_requests=args.max_keep_alive_requests,
+        static_files_path=args.root,
+        response_cache_size=args.response_cache_size,
+        threads=args.threads,
+        queue_size=args.queue_size,
+        access_log_path=args.access_log,
+    ).start()
@@ -0,0 +1,92 @@
+from http import HTTPStatus
+
+import pytest
+
+from server import FileCache, Request, RequestHandler, RequestParser
+
+
+def _request(headers: str = '') -> Request:
+    parser = RequestParser()
+    parser.feed(f'GET /file.txt HTTP/1.1\r\nHost: localhost\r\n{headers}\r\n'.encode('latin-1'))
+    return parser.pop()
+
+
+@pytest.fixture
+def handler(tmp_path):
+    (tmp_path / 'file.txt').write_bytes(b'0123456789')
+    return RequestHandler(files=FileCache(tmp_path))
+
+
+@pytest.mark.parametrize(
+    'header, expected',
+    [
+        ('bytes=0-4', [(0, 4)]),
+        ('bytes=5-', [(5, None)]),
+        ('bytes=-3', [(None, 3)]),
+        ('Bytes=0-0, 2-3', [(0, 0), (2, 3)]),
+        ('bytes=4-2', None),
+        ('bytes=-', None),
+        ('bytes=a-1', None),
+        ('bytes=\xb2-', None),
+        ('items=0-1', None),
+    ],
+)
+def test_Request_byte_ranges(header, expected):
+    # act
+    byte_ranges = _request(f'Range: {header}\r\n').byte_ranges
+
+    # assert
+    assert byte_ranges == expected
+
+
+def test_RequestHandler_handle__range(handler):
+    # act
+    response = handler.handle(_request('Range: bytes=2-4\r\n'), ('127.0.0.1', 0))
+
+    # assert
+    assert response.status == HTTPStatus.PARTIAL_CONTENT
+    assert response.headers['Content-Range'] == 'bytes 2-4/10'
+    assert response.body == b'234'
+
+
+def test_RequestHandler_handle__multiple_ranges(handler):
+    # act
+    response = handler.handle(_request('Range: bytes=0-1,-2\r\n'), ('127.0.0.1', 0))
+
+    # assert
+    assert response.status == HTTPStatus.PARTIAL_CONTENT
+    assert response.headers['Content-Type'].startswith('multipart/byteranges; boundary=')
+    body = b''.join(response.body)
+    assert b'Content-Range: bytes 0-1/10\r\n\r\n01' in body
+    assert b'Content-Range: bytes 8-9/10\r\n\r\n89' in body
+
+
+def test_RequestHandler_handle__range_not_satisfiable(handler):
+    # act
+    response = handler.handle(_request('Range: bytes=10-\r\n'), ('127.0.0.1', 0))
+
+    # assert
+    assert response.status == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+    assert response.headers['Content-Range'] == 'bytes */10'
+
+
+def test_RequestHandler_handle__malformed_range(handler):
+    # act
+    response = handler.handle(_request('Range: bytes=\xb2-\r\n'), ('127.0.0.1', 0))
+
+    # assert
+    assert response.status == HTTPStatus.OK
+    assert response.body == b'0123456789'
+
+
+@pytest.mark.parametrize('path', ['/%00', '/' + 'a' * 5000, '/../file.txt', '/missing.txt'])
+def test_RequestHandler_handle__not_found(handler, path):
+    # arrange
+    parser = RequestParser()
+    parser.feed(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+
+    # act
+    response = handler.handle(parser.pop(), ('127.0.0.1', 0))
+
+    # assert
+    assert response.status == HTTPStatus.NOT_FOUND
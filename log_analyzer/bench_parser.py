@@ -0,0 +1,76 @@
+import argparse
+import random
+import timeit
+
+from log_analyzer.parser import BytesLogParser, LogLine, LogParser
+
+LINE = (
+    '{ip} -  - [29/Jun/2017:03:50:22 +0300] "{method} {url} HTTP/1.1" 200 {size} "-" "{user_agent}" "-" '
+    '"1498697422-2190034393-4708-9752759" "{user}" {time:.3f}\n'
+)
+USER_AGENTS = [
+    'Lynx/2.8.8dev.9 libwww-FM/2.14 SSL-MM/1.4.1 GNUTLS/2.10.5',
+    'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/52.0.2743.116 Safari/537.36',
+    'python-requests/2.13.0',
+    '-',
+]
+MALFORMED_LINE = '1.194.135.240 -  - [29/Jun/2017:03:50:23 +0300] "0" 400 166 "-" "-" "-" "-" "-" 0.000\n'
+
+
+class RegexLogParser(LogParser):
+
+    def _parse_fast(self, line: str) -> LogLine | None:
+        return None
+
+
+def generate_lines(count: int, malformed_ratio: float) -> list[str]:
+    random.seed(0)
+    lines = []
+    for _ in range(count):
+        if random.random() < malformed_ratio:
+            lines.append(MALFORMED_LINE)
+            continue
+        lines.append(LINE.format(
+            ip=f'1.{random.randrange(256)}.{random.randrange(256)}.{random.randrange(256)}',
+            method=random.choice(['GET', 'GET', 'GET', 'POST']),
+            url=f'/api/v2/banner/{random.randrange(100000)}',
+            size=random.randrange(100000),
+            user_agent=random.choice(USER_AGENTS),
+            user=f'{random.getrandbits(36):x}',
+            time=random.lognormvariate(-1, 1),
+        ))
+    return lines
+
+
+def parse(parser_class: type[LogParser], lines: list[str] | list[bytes]) -> int:
+    return sum(1 for line in parser_class(reader=iter(lines)) if line)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='Parser benchmark', description='Compare log line parsers')
+    parser.add_argument('-n', '--lines', type=int, default=100000, help='Lines in the sample')
+    parser.add_argument('--malformed', type=float, default=0.001, help='Share of malformed lines')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Runs of every parser')
+    return parser.parse_args()
+
+
+def main(lines_count: int, malformed_ratio: float, repeat: int) -> None:
+    lines = generate_lines(lines_count, malformed_ratio)
+    byte_lines = [line.encode() for line in lines]
+    parsers = {
+        'regex': (RegexLogParser, lines),
+        'fast path': (LogParser, lines),
+        'bytes': (BytesLogParser, byte_lines),
+    }
+    expected = list(RegexLogParser(reader=iter(lines)))
+    assert all(list(parser_class(reader=iter(sample))) == expected for parser_class, sample in parsers.values())
+    timings = {}
+    for name, (parser_class, sample) in parsers.items():
+        timings[name] = min(timeit.repeat(lambda: parse(parser_class, sample), number=1, repeat=repeat))
+        speedup = timings['regex'] / timings[name]
+        print(f'{name:<10}{timings[name]:>8.3f}s{lines_count / timings[name]:>12.0f} lines/s{speedup:>8.2f}x')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args.lines, args.malformed, args.repeat)
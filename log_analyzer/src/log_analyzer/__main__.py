@@ -1,4 +1,6 @@
 import argparse
+from dataclasses import replace
+from datetime import date
 from json import JSONDecodeError
 import logging
 from pathlib import Path
@@ -6,10 +8,11 @@ import sys
 import time
 from types import MappingProxyType
 
+from .checkpoint import CheckpointStore
 from .config import Config, get_config
 from .logger import build_logging
-from .parser import LogParser
-from .path import get_log_path
+from .path import get_log_path, get_log_paths
+from .profiling import PipelineStats, profile
 from .report import ReportBuilder
 
 
@@ -17,6 +20,7 @@ DEFAULT_CONFIG = MappingProxyType({
     'REPORT_SIZE': 1000,
     'REPORT_DIR': './reports',
     'LOG_DIR': './log',
+    'WORKERS': 1,
 })
 
 
@@ -25,19 +29,40 @@ def parse_args() -> argparse.Namespace:
         prog='Log Analyzer', 
         description='Analyze nginx logs and build statistics report')
     parser.add_argument('-c', '--config')
+    parser.add_argument('-w', '--workers', type=int, help='Number of processes parsing the log, overrides WORKERS')
+    parser.add_argument('--date-from', type=date.fromisoformat, help='First day of logs to analyze, YYYY-MM-DD')
+    parser.add_argument('--date-to', type=date.fromisoformat, help='Last day of logs to analyze, YYYY-MM-DD')
+    parser.add_argument('--glob', help='Pattern of log file names to analyze, e.g. "*.gz"')
+    parser.add_argument('--progress', type=float, metavar='SECONDS', help='Log reading progress every SECONDS')
+    parser.add_argument('--profile', type=Path, metavar='PATH', help='Profile the run with cProfile and dump stats to PATH')
     return parser.parse_args()
 
 
-def main(config: Config) -> None:
+def main(config: Config, args: argparse.Namespace) -> None:
     logger = logging.getLogger()
-    log_path = get_log_path(config.log_directory)
-    if not log_path:
+    if args.date_from or args.date_to or args.glob:
+        log_paths = get_log_paths(config.log_directory, args.date_from, args.date_to, args.glob or '*')
+    else:
+        log_paths = [log_path] if (log_path := get_log_path(config.log_directory)) else []
+    if not log_paths:
         logger.info('No log to analyze')
         return
-    logger.info(f'Log to analyze {log_path.path}')
-    report_builder = ReportBuilder(config.report_directory, log_path.date, config.report_size)
-    log_parser = LogParser(reader=log_path.open())
-    report_builder.build(log_parser)
+    logger.info(f'Logs to analyze {", ".join(str(log_path.path) for log_path in log_paths)}')
+    report_builder = ReportBuilder(
+        config.report_directory,
+        log_paths[0].date,
+        config.report_size,
+        median_error=config.median_error,
+        workers=config.workers,
+        checkpoint_store=CheckpointStore(config.checkpoint_directory) if config.checkpoint_directory else None,
+        report_end_date=log_paths[-1].date,
+        normalize_urls=config.normalize_urls,
+        save_columns=config.save_columns,
+        backend=config.backend,
+        stats=PipelineStats(progress_interval=args.progress),
+    )
+    report_builder.build(log_paths)
+    report_builder.stats.log_summary()
 
 
 if __name__ == "__main__":
@@ -47,8 +72,11 @@ if __name__ == "__main__":
     config_path = Path(args.config) if args.config else None
     try:
         config = get_config(default_config=DEFAULT_CONFIG, custom_config_path=config_path)
+        if args.workers:
+            config = replace(config, workers=args.workers)
         build_logging(path=config.app_logging_path)
-        main(config)
+        with profile(args.profile):
+            main(config, args)
     except (FileNotFoundError, NotADirectoryError, JSONDecodeError) as exception:
         logging.getLogger().exception(exception, exc_info=False)
         sys.exit(1)
@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+import logging
+import os
+from pathlib import Path
+import pickle
+
+from .path import LogPath, LogPosition
+from .stat import UrlsStat
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+
+    median_error: float | None
+    normalize_urls: bool
+    backend: str
+    # Size of the log when it was read, the same size means no lines were appended since
+    size: int
+    position: LogPosition
+    urls_stat: UrlsStat
+    unparsed: int
+
+
+class CheckpointStore:
+
+    PATTERN = 'checkpoint-*.pickle'
+
+    def __init__(self, directory: Path) -> None:
+        self._directory = directory
+        self._logger = logging.getLogger()
+
+    def load(
+            self,
+            log_path: LogPath,
+            median_error: float | None,
+            normalize_urls: bool = False,
+            backend: str = 'python',
+        ) -> Checkpoint | None:
+        path = self._path(log_path)
+        if not path.is_file():
+            return None
+        with open(path, 'rb') as file:
+            checkpoint: Checkpoint = pickle.load(file)
+        if checkpoint.median_error != median_error:
+            self._logger.info(f'Checkpoint {path} is for another MEDIAN_ERROR, log is read from the beginning')
+            return None
+        if checkpoint.normalize_urls != normalize_urls:
+            self._logger.info(f'Checkpoint {path} is for another NORMALIZE_URLS, log is read from the beginning')
+            return None
+        # Aggregates of different backends can not be merged
+        if checkpoint.backend != backend:
+            self._logger.info(f'Checkpoint {path} is for another BACKEND, log is read from the beginning')
+            return None
+        if log_path.path.stat().st_size < checkpoint.position.offset:
+            self._logger.info(f'Log {log_path.path} is shorter than checkpoint {path}, log is read from the beginning')
+            return None
+        return checkpoint
+
+    def save(self, log_path: LogPath, checkpoint: Checkpoint) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(log_path)
+        # Written aside and renamed, so a failed run leaves the previous checkpoint intact
+        temporary_path = path.with_suffix('.tmp')
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+        # Checkpoints of logs removed by rotation are not needed anymore
+        for stale_path in self._directory.glob(self.PATTERN):
+            if not (log_path.path.parent / self._log_name(stale_path)).exists():
+                stale_path.unlink(missing_ok=True)
+        self._logger.info(f'Checkpoint is saved to {path}')
+
+    def _path(self, log_path: LogPath) -> Path:
+        return self._directory / self.PATTERN.replace('*', log_path.path.name)
+
+    def _log_name(self, path: Path) -> str:
+        prefix, suffix = self.PATTERN.split('*')
+        return path.name.removeprefix(prefix).removesuffix(suffix)
@@ -0,0 +1,136 @@
+from array import array
+import ast
+from dataclasses import dataclass
+import heapq
+from pathlib import Path
+import sys
+from typing import Iterable, Iterator
+import zipfile
+
+from .stat import ExactUrlStat, UrlsStat
+
+# Columns are saved as NumPy .npz (a zip of .npy arrays), so numpy.load reads them as is,
+# while the analyzer itself reads and writes them with array from the standard library
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_ALIGNMENT = 64
+DESCRIPTIONS = {'d': '<f8', 'q': '<i8', 'I': '<u4', 'B': '|u1'}
+TYPECODES = {description: typecode for typecode, description in DESCRIPTIONS.items()}
+AGGREGATE_COLUMNS = ('url_data', 'url_offsets', 'count', 'time_sum', 'time_max', 'time_med', 'unparsed')
+
+
+@dataclass(frozen=True)
+class UrlAggregate:
+
+    entries: int
+    sum: float
+    max: float
+    median: float
+
+    @property
+    def average(self) -> float:
+        return self.sum / self.entries
+
+
+class ColumnarUrlsStat:
+    # Per-URL aggregates loaded from columns, only the URLs of the report top are decoded
+
+    def __init__(self, columns: dict[str, array]) -> None:
+        self._columns = columns
+
+    @property
+    def entries(self) -> int:
+        return len(self._columns['count'])
+
+    @property
+    def sum(self) -> float:
+        return sum(self._columns['time_sum'])
+
+    @property
+    def unparsed(self) -> int:
+        return self._columns['unparsed'][0]
+
+    def top(self, size: int) -> Iterator[tuple[str, UrlAggregate]]:
+        time_sum = self._columns['time_sum']
+        for index in heapq.nlargest(size, range(len(time_sum)), key=time_sum.__getitem__):
+            yield self.url(index), UrlAggregate(
+                entries=self._columns['count'][index],
+                sum=time_sum[index],
+                max=self._columns['time_max'][index],
+                median=self._columns['time_med'][index],
+            )
+
+    def url(self, index: int) -> str:
+        offsets = self._columns['url_offsets']
+        return self._columns['url_data'][offsets[index]:offsets[index + 1]].tobytes().decode()
+
+
+def save_columns(path: Path, urls_stat: UrlsStat, unparsed: int) -> None:
+    columns = {
+        'url_data': array('B'),
+        'url_offsets': array('q', [0]),
+        'count': array('q'),
+        'time_sum': array('d'),
+        'time_max': array('d'),
+        'time_med': array('d'),
+        'unparsed': array('q', [unparsed]),
+    }
+    # Raw times are kept only by the exact stat
+    raw = all(isinstance(url_stat, ExactUrlStat) for url_stat in urls_stat.values())
+    if raw:
+        columns['url_id'] = array('I')
+        columns['request_time'] = array('d')
+    for url_id, (url, url_stat) in enumerate(urls_stat.items()):
+        columns['url_data'].frombytes(url.encode())
+        columns['url_offsets'].append(len(columns['url_data']))
+        columns['count'].append(url_stat.entries)
+        columns['time_sum'].append(url_stat.sum)
+        columns['time_max'].append(url_stat.max)
+        columns['time_med'].append(url_stat.median)
+        if raw:
+            columns['url_id'].extend(array('I', [url_id]) * url_stat.entries)
+            columns['request_time'].extend(url_stat.times)
+    write_columns(path, columns)
+
+
+def load_columns(path: Path) -> ColumnarUrlsStat:
+    # Raw times are not needed for the report
+    return ColumnarUrlsStat(read_columns(path, AGGREGATE_COLUMNS))
+
+
+def write_columns(path: Path, columns: dict[str, array]) -> None:
+    temporary_path = path.with_suffix('.tmp')
+    with zipfile.ZipFile(temporary_path, 'w', zipfile.ZIP_STORED) as file:
+        for name, column in columns.items():
+            file.writestr(f'{name}.npy', _to_npy(column))
+    temporary_path.replace(path)
+
+
+def read_columns(path: Path, names: Iterable[str] | None = None) -> dict[str, array]:
+    with zipfile.ZipFile(path) as file:
+        names = names or [name.removesuffix('.npy') for name in file.namelist()]
+        return {name: _from_npy(file.read(f'{name}.npy')) for name in names}
+
+
+def _to_npy(column: array) -> bytes:
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    header = repr({'descr': DESCRIPTIONS[column.typecode], 'fortran_order': False, 'shape': (len(column),)})
+    # Data starts at an aligned offset, the header is padded with spaces and ends with a newline
+    padding = -(len(NPY_MAGIC) + 2 + len(header) + 1) % NPY_ALIGNMENT
+    header = (header + ' ' * padding + '\n').encode('latin-1')
+    return NPY_MAGIC + len(header).to_bytes(2, 'little') + header + column.tobytes()
+
+
+def _from_npy(data: bytes) -> array:
+    if not data.startswith(NPY_MAGIC):
+        raise ValueError('Only version 1.0 of .npy format is supported')
+    header_end = len(NPY_MAGIC) + 2 + int.from_bytes(data[len(NPY_MAGIC):len(NPY_MAGIC) + 2], 'little')
+    header = ast.literal_eval(data[len(NPY_MAGIC) + 2:header_end].decode('latin-1'))
+    if header['fortran_order'] or len(header['shape']) != 1:
+        raise ValueError(f'Only one-dimensional columns are supported, got {header}')
+    column = array(TYPECODES[header['descr']])
+    column.frombytes(data[header_end:])
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
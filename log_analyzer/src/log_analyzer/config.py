@@ -11,6 +11,12 @@ class Config:
     report_directory: Path
     log_directory: Path
     app_logging_path: Path | None = None
+    median_error: float | None = None
+    workers: int = 1
+    checkpoint_directory: Path | None = None
+    normalize_urls: bool = False
+    save_columns: bool = False
+    backend: str = 'python'
 
     @classmethod
     def from_dict(cls, dict_: dict) -> Self:
@@ -19,6 +25,12 @@ class Config:
             report_directory=Path(dict_['REPORT_DIR']),
             log_directory=Path(dict_['LOG_DIR']),
             app_logging_path=Path(dict_['APP_LOGGING_PATH']) if 'APP_LOGGING_PATH' in dict_ else None,
+            median_error=dict_.get('MEDIAN_ERROR'),
+            workers=dict_.get('WORKERS', 1),
+            checkpoint_directory=Path(dict_['CHECKPOINT_DIR']) if dict_.get('CHECKPOINT_DIR') else None,
+            normalize_urls=dict_.get('NORMALIZE_URLS', False),
+            save_columns=dict_.get('SAVE_COLUMNS', False),
+            backend=dict_.get('BACKEND', 'python'),
         )
 
 
@@ -0,0 +1,178 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from pathlib import Path
+import queue
+from typing import Callable, IO, Iterator
+
+from .parser import BytesLogParser
+from .path import LogPath, split_lines
+from .profiling import PipelineStats
+from .stat import UrlsStat
+
+
+QUEUE_TIMEOUT = 1
+
+
+def read_logs_parallel(
+        log_path: LogPath,
+        workers: int,
+        urls_stat_factory: Callable[[], UrlsStat],
+        normalize_urls: bool = False,
+        stats: PipelineStats | None = None,
+    ) -> tuple[UrlsStat, int]:
+    # Workers return read lines and bytes with their partials, the stats of worker processes are lost otherwise
+    if log_path.extension == '.gz':
+        partials = _read_compressed(log_path, workers, urls_stat_factory, normalize_urls)
+    else:
+        partials = _read_plain(log_path.path, workers, urls_stat_factory, normalize_urls)
+    urls_stat = urls_stat_factory()
+    unparsed = 0
+    for partial_stat, partial_unparsed, lines, size in partials:
+        urls_stat.merge(partial_stat)
+        unparsed += partial_unparsed
+        if stats:
+            stats.add_bytes(size)
+            stats.add_lines(lines)
+    return urls_stat, unparsed
+
+
+def _read_plain(
+        path: Path,
+        workers: int,
+        urls_stat_factory: Callable[[], UrlsStat],
+        normalize_urls: bool,
+    ) -> list[tuple[UrlsStat, int, int, int]]:
+    # Every worker reads its own byte range of the file, ranges start at line beginnings
+    ranges = _split(path, workers)
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(
+            _read_range,
+            [path] * len(ranges),
+            *zip(*ranges),
+            [urls_stat_factory] * len(ranges),
+            [normalize_urls] * len(ranges),
+        ))
+
+
+def _read_compressed(
+        log_path: LogPath,
+        workers: int,
+        urls_stat_factory: Callable[[], UrlsStat],
+        normalize_urls: bool,
+    ) -> list[tuple[UrlsStat, int, int, int]]:
+    # Gzip stream can not be split, so it is decompressed once here and fanned out to workers in blocks
+    # of whole lines. Every worker accumulates a single partial stat, so the parent merges only a few
+    blocks = multiprocessing.Queue(maxsize=workers * 2)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=_consume_blocks,
+            args=(blocks, results, urls_stat_factory, normalize_urls),
+            daemon=True,
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for block in log_path.read_blocks():
+            _put(blocks, block, processes)
+        for _ in processes:
+            _put(blocks, None, processes)
+        partials = [_get(results, processes) for _ in processes]
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+    return partials
+
+
+def _put(blocks: multiprocessing.Queue, block: bytes | None, processes: list[multiprocessing.Process]) -> None:
+    while True:
+        try:
+            blocks.put(block, timeout=QUEUE_TIMEOUT)
+            return
+        except queue.Full:
+            _check_processes(processes)
+
+
+def _get(results: multiprocessing.Queue, processes: list[multiprocessing.Process]) -> tuple[UrlsStat, int, int, int]:
+    while True:
+        try:
+            return results.get(timeout=QUEUE_TIMEOUT)
+        except queue.Empty:
+            _check_processes(processes)
+
+
+def _check_processes(processes: list[multiprocessing.Process]) -> None:
+    for process in processes:
+        if process.exitcode:
+            raise RuntimeError(f'Log reading process {process.pid} failed with exit code {process.exitcode}')
+
+
+def _split(path: Path, parts: int) -> list[tuple[int, int]]:
+    size = path.stat().st_size
+    offsets = [0]
+    with open(path, 'rb') as file:
+        for part in range(1, parts):
+            file.seek(max(size * part // parts, offsets[-1]))
+            file.readline()
+            offsets.append(min(file.tell(), size))
+    offsets.append(size)
+    return [(start, end) for start, end in zip(offsets, offsets[1:]) if start < end]
+
+
+def _read_range(
+        path: Path,
+        start: int,
+        end: int,
+        urls_stat_factory: Callable[[], UrlsStat],
+        normalize_urls: bool,
+    ) -> tuple[UrlsStat, int, int, int]:
+    read_lines = 0
+
+    def count_lines(lines: Iterator[bytes]) -> Iterator[bytes]:
+        nonlocal read_lines
+        for line in lines:
+            read_lines += 1
+            yield line
+
+    with open(path, 'rb') as file:
+        file.seek(start)
+        lines = count_lines(_iter_lines(file, end - start))
+        urls_stat, unparsed = _read_lines(lines, urls_stat_factory, normalize_urls)
+    return urls_stat, unparsed, read_lines, end - start
+
+
+def _iter_lines(file: IO[bytes], size: int) -> Iterator[bytes]:
+    for line in file:
+        if size <= 0:
+            return
+        size -= len(line)
+        yield line
+
+
+def _consume_blocks(
+        blocks: multiprocessing.Queue,
+        results: multiprocessing.Queue,
+        urls_stat_factory: Callable[[], UrlsStat],
+        normalize_urls: bool,
+    ) -> None:
+    urls_stat = urls_stat_factory()
+    unparsed = lines = size = 0
+    while (block := blocks.get()) is not None:
+        block_lines = split_lines(block)
+        unparsed += urls_stat.add_lines(BytesLogParser(reader=iter(block_lines), normalize_urls=normalize_urls))
+        lines += len(block_lines)
+        size += len(block)
+    results.put((urls_stat, unparsed, lines, size))
+
+
+def _read_lines(
+        lines: Iterator[bytes],
+        urls_stat_factory: Callable[[], UrlsStat],
+        normalize_urls: bool,
+    ) -> tuple[UrlsStat, int]:
+    urls_stat = urls_stat_factory()
+    unparsed = urls_stat.add_lines(BytesLogParser(reader=lines, normalize_urls=normalize_urls))
+    return urls_stat, unparsed
@@ -1,8 +1,15 @@
 from dataclasses import dataclass
-from functools import cached_property
+from functools import cached_property, lru_cache
 import re
 from typing import Iterator
 
+# Numbers, UUIDs and long hex strings between slashes are taken for IDs
+URL_ID_PATTERN = re.compile(
+    r'(?<=/)(?:\d+|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{16,})(?=/|$)',
+    re.IGNORECASE,
+)
+URL_ID_PLACEHOLDER = '{id}'
+
 
 @dataclass(frozen=True)
 class LogLine:
@@ -15,22 +22,78 @@ class LogLine:
         return cls(url=dict_['url'], request_time=float(dict_['request_time']))
 
 
+@lru_cache(maxsize=65536)
+def normalize_url(url: str) -> str:
+    path = url.partition('?')[0]
+    return URL_ID_PATTERN.sub(URL_ID_PLACEHOLDER, path)
+
+
 class LogParser:
 
-    def __init__(self, reader: Iterator[str]) -> None:
+    # Request, referer, user agent, forwarded for, request id and user are quoted, so a line splits into 13 parts
+    FIELDS_COUNT = 13
+    QUOTE = '"'
+    SPACE = ' '
+    QUOTED_FIELDS_SEPARATORS = [SPACE] * 4
+
+    def __init__(self, reader: Iterator[str], normalize_urls: bool = False) -> None:
         self._reader = reader
+        self._normalize_urls = normalize_urls
     
     def __iter__(self):
         return self
 
     def __next__(self) -> LogLine | None:
         line = next(self._reader)
+        return self._parse_fast(line) or self._parse_regex(line)
+
+    def _parse_fast(self, line: str) -> LogLine | None:
+        # Only the request and the last field are taken by quotes, a line of another layout is left to the regex
+        fields = line.split(self.QUOTE)
+        if len(fields) != self.FIELDS_COUNT or fields[4:11:2] != self.QUOTED_FIELDS_SEPARATORS:
+            return None
+        try:
+            method, url, protocol = fields[1].split(self.SPACE)
+            request_time = float(fields[-1])
+        except ValueError:
+            return None
+        if not (method and url and protocol) or not fields[-1].startswith(self.SPACE):
+            return None
+        url = self._decode(url)
+        return LogLine(url=normalize_url(url) if self._normalize_urls else url, request_time=request_time)
+
+    @staticmethod
+    def _decode(field: str) -> str:
+        return field
+
+    def _parse_regex(self, line: str) -> LogLine | None:
         match = self._pattern.match(line)
         if not match:
             return None
-        return LogLine.from_dict(match.groupdict())
+        log_line = LogLine.from_dict(match.groupdict())
+        if self._normalize_urls:
+            return LogLine(url=normalize_url(log_line.url), request_time=log_line.request_time)
+        return log_line
 
     @cached_property
     def _pattern(self) -> re.Pattern:
         return re.compile(
             r'\S+ \S+  \S+ \[\S+ \S+\] "\S+ (?P<url>\S+) \S+" \S+ \S+ "\S+" ".*?" "\S+" "\S+" "\S+" (?P<request_time>\S+)')
+
+
+class BytesLogParser(LogParser):
+
+    # Lines stay undecoded, only the URL is decoded on the fast path
+    QUOTE = b'"'
+    SPACE = b' '
+    QUOTED_FIELDS_SEPARATORS = [SPACE] * 4
+
+    def __init__(self, reader: Iterator[bytes], normalize_urls: bool = False) -> None:
+        super().__init__(reader, normalize_urls)
+
+    @staticmethod
+    def _decode(field: bytes) -> str:
+        return field.decode()
+
+    def _parse_regex(self, line: bytes) -> LogLine | None:
+        return super()._parse_regex(line.decode())
@@ -1,9 +1,15 @@
 from dataclasses import dataclass
 from datetime import date, datetime
-import gzip
+from fnmatch import fnmatch
+import mmap
 from pathlib import Path
 import re
-from typing import Iterator
+from typing import BinaryIO, Iterator
+import zlib
+
+READ_SIZE = 64 * 1024
+# Gzip header and trailer are expected around the deflate stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
 
 
 @dataclass(frozen=True)
@@ -13,9 +19,120 @@ class LogPath:
     date: date
     extension: str | None
 
-    def open(self, mode: str = 'rt'):
-        open_method = gzip.open if self.extension == '.gz' else open
-        return open_method(self.path, mode)
+    def read_blocks(self, read_size: int = READ_SIZE) -> Iterator[bytes]:
+        if self.extension == '.gz':
+            return LogReader(self, read_size=read_size).read_blocks()
+        return _read_mapped_blocks(self.path, read_size)
+
+
+@dataclass(frozen=True)
+class LogPosition:
+
+    # Start of a gzip member for a compressed log
+    offset: int = 0
+    # Decompressed bytes of the member already read
+    skip: int = 0
+
+
+class LogReader:
+    # Reads decompressed data in blocks of whole lines and tracks the position after the last block.
+    # A growing log is still written: its last line without a newline and an unfinished
+    # gzip member are left for the next read
+
+    def __init__(
+            self,
+            log_path: LogPath,
+            position: LogPosition = LogPosition(),
+            read_size: int = READ_SIZE,
+            growing: bool = False,
+        ) -> None:
+        self._log_path = log_path
+        self._position = position
+        self._read_size = read_size
+        self._growing = growing
+        # Starts of gzip members as offsets in the file and in the data decompressed from the position
+        self._members = [(position.offset, 0)]
+        self._read = 0
+
+    @property
+    def position(self) -> LogPosition:
+        return self._position
+
+    def read_blocks(self) -> Iterator[bytes]:
+        with open(self._log_path.path, 'rb') as file:
+            file.seek(self._position.offset)
+            if self._log_path.extension == '.gz':
+                chunks = self._decompress(file)
+            else:
+                chunks = iter(lambda: file.read(self._read_size), b'')
+            skip = self._position.skip
+            tail = b''
+            for chunk in chunks:
+                if skip:
+                    self._read += len(chunk[:skip])
+                    chunk, skip = chunk[skip:], max(skip - len(chunk), 0)
+                end = chunk.rfind(b'\n') + 1
+                if not end:
+                    tail += chunk
+                    continue
+                yield self._advance(tail + chunk[:end])
+                tail = chunk[end:]
+            if tail and not self._growing:
+                yield self._advance(tail)
+
+    def _advance(self, block: bytes) -> bytes:
+        self._read += len(block)
+        if self._log_path.extension != '.gz':
+            self._position = LogPosition(offset=self._position.offset + len(block))
+            return block
+        while len(self._members) > 1 and self._members[1][1] <= self._read:
+            self._members.pop(0)
+        offset, start = self._members[0]
+        self._position = LogPosition(offset=offset, skip=self._read - start)
+        return block
+
+    def _decompress(self, file: BinaryIO) -> Iterator[bytes]:
+        decompressor = zlib.decompressobj(GZIP_WBITS)
+        decompressed = 0
+        if not (chunk := file.read(self._read_size)):
+            return
+        while chunk:
+            data = decompressor.decompress(chunk)
+            decompressed += len(data)
+            yield data
+            # Gzip file may consist of several members, every one is a separate stream
+            while decompressor.eof and decompressor.unused_data:
+                unused_data = decompressor.unused_data
+                self._members.append((file.tell() - len(unused_data), decompressed))
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+                data = decompressor.decompress(unused_data)
+                decompressed += len(data)
+                yield data
+            chunk = file.read(self._read_size)
+        yield decompressor.flush()
+        if not decompressor.eof and not self._growing:
+            raise EOFError(f'Compressed file {file.name} ended before the end-of-stream marker was reached')
+
+
+def split_lines(block: bytes) -> list[bytes]:
+    lines = block.split(b'\n')
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _read_mapped_blocks(path: Path, read_size: int = READ_SIZE) -> Iterator[bytes]:
+    with open(path, 'rb') as file:
+        # Empty file can not be mapped
+        if not (size := file.seek(0, 2)):
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start = 0
+            while start < size:
+                # Block ends after the last newline within the read size, or after the first one for a longer line
+                end = mapped.rfind(b'\n', start, start + read_size) + 1 or mapped.find(b'\n', start) + 1 or size
+                yield mapped[start:end]
+                start = end
 
 
 def get_log_path(log_directory: Path) -> LogPath | None:
@@ -29,6 +146,22 @@ def get_log_path(log_directory: Path) -> LogPath | None:
     return fresh
 
 
+def get_log_paths(
+        log_directory: Path,
+        date_from: date | None = None,
+        date_to: date | None = None,
+        pattern: str = '*',
+    ) -> list[LogPath]:
+    paths = (
+        path
+        for path in _get_log_paths(log_directory)
+        if fnmatch(path.path.name, pattern)
+        and (not date_from or path.date >= date_from)
+        and (not date_to or path.date <= date_to)
+    )
+    return sorted(paths, key=lambda path: path.date)
+
+
 def _get_log_paths(log_directory: Path) -> Iterator[LogPath]:
     pattern = re.compile(r'^nginx-access-ui.log-(?P<date>\d+)(?P<extension>.gz)?$')
     return (
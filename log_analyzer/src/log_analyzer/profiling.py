@@ -0,0 +1,111 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import cProfile
+import io
+import logging
+from pathlib import Path
+import pstats
+import resource
+import sys
+import time
+from typing import Iterator
+
+MEGABYTE = 1024 * 1024
+PROFILE_TOP = 20
+
+
+class PipelineStats:
+
+    def __init__(self, progress_interval: float | None = None) -> None:
+        self._progress_interval = progress_interval
+        self._timings: defaultdict[str, float] = defaultdict(float)
+        self._lines = 0
+        self._bytes = 0
+        self._started = time.perf_counter()
+        self._progress_logged = self._started
+        self._logger = logging.getLogger()
+
+    @property
+    def timings(self) -> dict[str, float]:
+        return dict(self._timings)
+
+    @property
+    def lines(self) -> int:
+        return self._lines
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._timings[name] += time.perf_counter() - start
+
+    def read(self, blocks: Iterator[bytes]) -> Iterator[bytes]:
+        # Time of reading and decompressing is what is spent getting the next block
+        while True:
+            with self.stage('read'):
+                block = next(blocks, None)
+            if block is None:
+                return
+            self._bytes += len(block)
+            yield block
+
+    def add_bytes(self, size: int) -> None:
+        self._bytes += size
+
+    def add_lines(self, lines: int) -> None:
+        self._lines += lines
+        if self._progress_interval is None:
+            return
+        now = time.perf_counter()
+        if now - self._progress_logged >= self._progress_interval:
+            self._progress_logged = now
+            elapsed = now - self._started
+            self._logger.info(
+                f'Progress: {self._lines} lines, {self._bytes / MEGABYTE:.1f} MiB, '
+                f'{self._lines / elapsed:.0f} lines/s, {self._bytes / MEGABYTE / elapsed:.1f} MiB/s'
+            )
+
+    def log_summary(self) -> None:
+        elapsed = time.perf_counter() - self._started
+        timings = ', '.join(f'{name} {duration:.2f}s' for name, duration in self._timings.items())
+        self._logger.info(f'Stages: {timings or "none"}')
+        if self._lines:
+            read_time = sum(self._timings[name] for name in ('read', 'parse', 'aggregate', 'parallel read'))
+            self._logger.info(
+                f'Throughput: {self._lines} lines, {self._bytes / MEGABYTE:.1f} MiB in {read_time:.2f}s, '
+                f'{self._lines / read_time:.0f} lines/s, {self._bytes / MEGABYTE / read_time:.1f} MiB/s'
+            )
+        self._logger.info(f'Peak RSS: {get_peak_rss() / MEGABYTE:.1f} MiB, elapsed {elapsed:.2f}s')
+
+
+def get_peak_rss() -> int:
+    # Worker processes are counted by the largest of them
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@contextmanager
+def profile(path: Path | None) -> Iterator[None]:
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats(pstats.SortKey.TIME).print_stats(PROFILE_TOP)
+        logging.getLogger().info(f'Profile is saved to {path}, top functions by own time:\n{output.getvalue()}')
@@ -1,38 +1,88 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
 import logging
 from pathlib import Path
 from string import Template
+from typing import Iterator
 
+from .checkpoint import Checkpoint, CheckpointStore
+from .columnar import ColumnarUrlsStat, load_columns, save_columns, UrlAggregate
 from .constants import REPORT_TEMPLATE_PATH
-from .parser import LogParser
-from .stat import UrlsStat, UrlStat
+from .parallel import read_logs_parallel
+from .parser import BytesLogParser, LogParser
+from .path import LogPath, LogPosition, LogReader, split_lines
+from .profiling import PipelineStats
+from .stat import get_urls_stat_factory, UrlsStat, UrlStat
 
 
 class ReportBuilder:
 
+    TABLE_MARKER = '\0table_json\0'
+
     def __init__(
             self, 
             report_directory: Path, 
             report_date: date, 
             report_size: int,
             unparsed_logs_coef: float = 0.01,
+            median_error: float | None = None,
+            workers: int = 1,
+            checkpoint_store: CheckpointStore | None = None,
+            report_end_date: date | None = None,
+            normalize_urls: bool = False,
+            save_columns: bool = False,
+            backend: str = 'python',
+            stats: PipelineStats | None = None,
         ) -> None:
-        self._path = report_directory / f'report-{report_date.strftime("%Y.%m.%d")}.html'
+        report_dates = report_date.strftime('%Y.%m.%d')
+        if report_end_date and report_end_date != report_date:
+            report_dates += f'-{report_end_date.strftime("%Y.%m.%d")}'
+        self._path = report_directory / f'report-{report_dates}.html'
+        self._columns_path = self._path.with_suffix('.npz') if save_columns else None
         self._report_size = report_size
         self._unparsed_logs_coef = unparsed_logs_coef
+        self._median_error = median_error
+        self._urls_stat_factory = get_urls_stat_factory(median_error, backend)
+        self._backend = backend
+        self._workers = workers
+        self._checkpoint_store = checkpoint_store
+        self._normalize_urls = normalize_urls
+        self._stats = stats or PipelineStats()
         self._logger = logging.getLogger()
 
     @property
     def path(self) -> Path:
         return self._path
+
+    @property
+    def columns_path(self) -> Path | None:
+        return self._columns_path
+
+    @property
+    def stats(self) -> PipelineStats:
+        return self._stats
     
-    def build(self, log_parser: LogParser) -> str:
-        if self._is_report_exists:
+    def build(self, logs: LogParser | LogPath | list[LogPath]) -> str:
+        # Incremental report is rebuilt by every run to include the lines appended since the previous one
+        if self._is_report_exists and not self._checkpoint_store:
             self._logger.info(f'Report {self._path} is already exist')
             return
-        self._logger.info('Reading logs...')
-        stat, unparsed = self._read_logs(log_parser)
-        self._logger.info('Logs are read')
+        if self._columns_path and self._columns_path.is_file() and not self._checkpoint_store:
+            self._logger.info(f'Loading URL aggregates from {self._columns_path}')
+            with self._stats.stage('load'):
+                stat = load_columns(self._columns_path)
+            unparsed = stat.unparsed
+        else:
+            self._logger.info('Reading logs...')
+            stat, unparsed = self._read_logs(logs)
+            self._logger.info('Logs are read')
+            if self._columns_path:
+                with self._stats.stage('save columns'):
+                    save_columns(self._columns_path, stat, unparsed)
+                self._logger.info(f'URL aggregates are saved to {self._columns_path}')
+        if not stat.entries:
+            self._logger.info('No log lines to build report')
+            return
         if self._are_unparsed_logs_exceed_bound(total=stat.entries, unparsed=unparsed):
             unparsed_percent = round(unparsed / stat.entries * 100, 2)
             limit_percent = round(self._unparsed_logs_coef * 100, 2)
@@ -40,23 +90,98 @@ class ReportBuilder:
             self._logger.warning(log)
             return
         self._logger.info('Building report...')
-        table_json = self._build_table_json(stat)
-        template = self._read_template()
-        template = template.safe_substitute(table_json=table_json)
-        with open(self._path, 'wt') as f:
-            f.write(template)
+        with self._stats.stage('render'):
+            head, tail = self._read_template().safe_substitute(table_json=self.TABLE_MARKER).split(self.TABLE_MARKER)
+        # Top URLs are selected, rendered in the format of the whole list repr and written one row at a time
+        with self._stats.stage('write'), open(self._path, 'wt') as f:
+            f.write(head + '[')
+            for index, row in enumerate(self._build_table_json(stat)):
+                f.write(f', {row!r}' if index else repr(row))
+            f.write(']' + tail)
         self._logger.info(f'Report is built and saved to: {self.path}')
     
-    def _read_logs(self, log_parser: LogParser) -> tuple[UrlsStat, int]:
-        urls_stat = UrlsStat()
+    def _read_logs(self, logs: LogParser | LogPath | list[LogPath]) -> tuple[UrlsStat, int]:
+        urls_stat = self._urls_stat_factory()
+        if isinstance(logs, LogParser):
+            with self._stats.stage('parse and aggregate'):
+                unparsed = urls_stat.add_lines(logs)
+            return urls_stat, unparsed
+        log_paths = [logs] if isinstance(logs, LogPath) else logs
+        # Stages of worker processes are not tracked, their whole time is counted as a single stage
+        if len(log_paths) == 1 and self._workers > 1 and not self._checkpoint_store:
+            with self._stats.stage('parallel read'):
+                return read_logs_parallel(
+                    log_paths[0], self._workers, self._urls_stat_factory, self._normalize_urls, self._stats,
+                )
         unparsed = 0
-        for line in log_parser:
-            if line:
-                urls_stat[line.url] += line.request_time
-            else:
-                unparsed += 1
+        if len(log_paths) > 1 and self._workers > 1:
+            # Every log is read by its own process, a gzip stream can not be split anyway
+            workers = min(self._workers, len(log_paths))
+            with self._stats.stage('parallel read'), ProcessPoolExecutor(workers) as executor:
+                for partial_stat, partial_unparsed, lines, size in executor.map(self._read_log_in_process, log_paths):
+                    urls_stat.merge(partial_stat)
+                    unparsed += partial_unparsed
+                    self._stats.add_bytes(size)
+                    self._stats.add_lines(lines)
+            return urls_stat, unparsed
+        for partial_stat, partial_unparsed in map(self._read_log, log_paths):
+            urls_stat.merge(partial_stat)
+            unparsed += partial_unparsed
         return urls_stat, unparsed
 
+    def _read_log_in_process(self, log_path: LogPath) -> tuple[UrlsStat, int, int, int]:
+        # Runs on a copy of the builder in a worker process, so its read lines and bytes are returned to the parent
+        self._stats = PipelineStats()
+        urls_stat, unparsed = self._read_log(log_path)
+        return urls_stat, unparsed, self._stats.lines, self._stats.bytes
+
+    def _read_log(self, log_path: LogPath) -> tuple[UrlsStat, int]:
+        if self._checkpoint_store:
+            return self._read_log_incrementally(log_path)
+        urls_stat = self._urls_stat_factory()
+        unparsed = self._read_blocks(log_path.read_blocks(), urls_stat)
+        return urls_stat, unparsed
+
+    def _read_log_incrementally(self, log_path: LogPath) -> tuple[UrlsStat, int]:
+        size = log_path.path.stat().st_size
+        checkpoint = self._checkpoint_store.load(log_path, self._median_error, self._normalize_urls, self._backend)
+        unchanged = checkpoint is not None and checkpoint.size == size
+        if unchanged and (log_path.extension == '.gz' or checkpoint.position.offset == size):
+            self._logger.info(f'Log {log_path.path} is not changed since checkpoint')
+            return checkpoint.urls_stat, checkpoint.unparsed
+        if checkpoint:
+            self._logger.info(f'Reading log {log_path.path} from checkpoint {checkpoint.position}')
+            urls_stat, unparsed, position = checkpoint.urls_stat, checkpoint.unparsed, checkpoint.position
+        else:
+            urls_stat, unparsed, position = self._urls_stat_factory(), 0, LogPosition()
+        # Plain log that stopped growing is finished, its last line without a newline is complete
+        reader = LogReader(log_path, position, growing=not unchanged)
+        unparsed += self._read_blocks(reader.read_blocks(), urls_stat)
+        checkpoint = Checkpoint(
+            median_error=self._median_error,
+            normalize_urls=self._normalize_urls,
+            backend=self._backend,
+            size=size,
+            position=reader.position,
+            urls_stat=urls_stat,
+            unparsed=unparsed,
+        )
+        with self._stats.stage('checkpoint'):
+            self._checkpoint_store.save(log_path, checkpoint)
+        return urls_stat, unparsed
+
+    def _read_blocks(self, blocks: Iterator[bytes], urls_stat: UrlsStat) -> int:
+        # Lines are parsed and aggregated by blocks to time both stages without a clock call per line
+        unparsed = 0
+        for block in self._stats.read(blocks):
+            lines = split_lines(block)
+            with self._stats.stage('parse'):
+                log_lines = list(BytesLogParser(reader=iter(lines), normalize_urls=self._normalize_urls))
+            with self._stats.stage('aggregate'):
+                unparsed += urls_stat.add_lines(log_lines)
+            self._stats.add_lines(len(lines))
+        return unparsed
+
     def _are_unparsed_logs_exceed_bound(self, total: int, unparsed: int) -> bool:
         return unparsed / total > self._unparsed_logs_coef
 
@@ -68,22 +193,18 @@ class ReportBuilder:
     def _is_report_exists(self) -> bool:
         return self.path.is_file()
 
-    def _build_table_json(self, urls_stat: UrlsStat) -> list[dict]:
-        report = []
+    def _build_table_json(self, urls_stat: UrlsStat | ColumnarUrlsStat) -> Iterator[dict]:
         urls_stat_sum = urls_stat.sum
         urls_stat_entries = urls_stat.entries
-        for url, url_stat in sorted(urls_stat.items(), key=lambda s: s[1].sum, reverse=True)[0:self._report_size]:
-            url_stat: UrlStat
-            report.append(
-                {
-                    'url': url,
-                    'count': url_stat.entries,
-                    'count_perc': round(url_stat.entries / urls_stat_entries, 3),
-                    'time_sum': round(url_stat.sum, 3),
-                    'time_perc': round(url_stat.sum / urls_stat_sum, 3),
-                    'time_avg': round(url_stat.average, 3),
-                    'time_max': round(url_stat.max, 3),
-                    'time_med': round(url_stat.median, 3),
-                }
-            )
-        return report
+        for url, url_stat in urls_stat.top(self._report_size):
+            url_stat: UrlStat | UrlAggregate
+            yield {
+                'url': url,
+                'count': url_stat.entries,
+                'count_perc': round(url_stat.entries / urls_stat_entries, 3),
+                'time_sum': round(url_stat.sum, 3),
+                'time_perc': round(url_stat.sum / urls_stat_sum, 3),
+                'time_avg': round(url_stat.average, 3),
+                'time_max': round(url_stat.max, 3),
+                'time_med': round(url_stat.median, 3),
+            }
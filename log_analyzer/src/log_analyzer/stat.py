@@ -1,49 +1,175 @@
+from abc import ABC, abstractmethod
+from array import array
 from collections import defaultdict
-import statistics
+from functools import partial
+import heapq
+import math
+from typing import Callable, Iterable, Iterator, Self
 
+from .parser import LogLine
 
-class UrlStat:
+
+class UrlStat(ABC):
 
     def __init__(self) -> None:
-        self._requests_times = []
-    
+        self._entries = 0
+        self._sum = 0.0
+        self._max = 0.0
+
     def add(self, time: float) -> None:
-        self._requests_times.append(time)
-    
+        self._entries += 1
+        self._sum += time
+        if time > self._max:
+            self._max = time
+
     def __iadd__(self, time) -> None:
         self.add(time)
         return self
 
+    def merge(self, other: Self) -> None:
+        self._entries += other._entries
+        self._sum += other._sum
+        self._max = max(self._max, other._max)
+
+    @abstractmethod
+    def quantile(self, q: float) -> float:
+        pass
+
     @property
     def entries(self) -> int:
-        return len(self._requests_times)
+        return self._entries
 
     @property
     def average(self) -> float:
         return self.sum / self.entries
-    
+
     @property
     def sum(self) -> float:
-        return sum(self._requests_times)
+        return self._sum
 
     @property
     def max(self) -> float:
-        return max(self._requests_times)
-    
+        return self._max
+
     @property
     def median(self) -> float:
-        return statistics.median(self._requests_times)
+        return self.quantile(0.5)
 
 
-class UrlsStat(defaultdict):
+class ExactUrlStat(UrlStat):
 
     def __init__(self) -> None:
-        super().__init__(UrlStat)
-    
+        super().__init__()
+        # 8 bytes per time instead of a float object and a list slot
+        self._requests_times = array('d')
+
+    def add(self, time: float) -> None:
+        super().add(time)
+        self._requests_times.append(time)
+
+    def merge(self, other: Self) -> None:
+        super().merge(other)
+        self._requests_times.extend(other._requests_times)
+
+    @property
+    def times(self) -> array:
+        return self._requests_times
+
+    def quantile(self, q: float) -> float:
+        times = sorted(self._requests_times)
+        position = q * (len(times) - 1)
+        lower = math.floor(position)
+        upper = math.ceil(position)
+        return times[lower] + (times[upper] - times[lower]) * (position - lower)
+
+
+class ApproximateUrlStat(UrlStat):
+    # Times are counted in logarithmic buckets (as in DDSketch): any quantile is estimated
+    # with a relative error not greater than relative_error, and sketches merge by adding counts
+
+    RELATIVE_ERROR = 0.01
+
+    def __init__(self, relative_error: float = RELATIVE_ERROR) -> None:
+        super().__init__()
+        self._relative_error = relative_error
+        self._gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: defaultdict[int, int] = defaultdict(int)
+        self._zeros = 0
+
+    def add(self, time: float) -> None:
+        super().add(time)
+        if time > 0:
+            self._buckets[math.ceil(math.log(time) / self._log_gamma)] += 1
+        else:
+            self._zeros += 1
+
+    def merge(self, other: Self) -> None:
+        super().merge(other)
+        self._zeros += other._zeros
+        for index, count in other._buckets.items():
+            self._buckets[index] += count
+
+    def quantile(self, q: float) -> float:
+        rank = q * (self.entries - 1)
+        seen = self._zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if rank < seen:
+                # Bucket covers (gamma ** (index - 1), gamma ** index]
+                return min(2 * self._gamma ** index / (self._gamma + 1), self._max)
+        return self._max
+
+
+def get_stat_factory(median_error: float | None = None) -> Callable[[], UrlStat]:
+    if median_error is None:
+        return ExactUrlStat
+    # Bucket growth (1 + error) / (1 - error) is defined and greater than 1 only inside (0, 1)
+    if not 0 < median_error < 1:
+        raise ValueError(f'MEDIAN_ERROR must be between 0 and 1 exclusive, got {median_error}')
+    return partial(ApproximateUrlStat, median_error)
+
+
+class UrlsStat(defaultdict):
+
+    def __init__(self, stat_factory: Callable[[], UrlStat] = ExactUrlStat) -> None:
+        super().__init__(stat_factory)
+
+    def add_lines(self, lines: Iterable[LogLine | None]) -> int:
+        unparsed = 0
+        for line in lines:
+            if line:
+                self[line.url] += line.request_time
+            else:
+                unparsed += 1
+        return unparsed
+
+    def merge(self, other: Self) -> None:
+        for url, url_stat in other.items():
+            self[url].merge(url_stat)
+
+    def top(self, size: int) -> Iterator[tuple[str, UrlStat]]:
+        # Sum of every URL is kept while reading, so only the top is selected without a full sort
+        return iter(heapq.nlargest(size, self.items(), key=lambda item: item[1].sum))
+
     @property
     def entries(self) -> int:
         return len(self)
-    
+
     @property
     def sum(self) -> float:
         return sum(url.sum for url in self.values())
+
+
+def get_urls_stat_factory(median_error: float | None = None, backend: str = 'python') -> Callable[[], UrlsStat]:
+    if backend == 'numpy':
+        if median_error is not None:
+            raise ValueError('NumPy backend computes exact medians, MEDIAN_ERROR is not supported with it')
+        # NumPy is an optional dependency and is imported only when the backend is chosen
+        from .vectorized import NumpyUrlsStat
+        return NumpyUrlsStat
+    if backend != 'python':
+        raise ValueError(f'Unknown aggregation backend {backend}, expected python or numpy')
+    return partial(UrlsStat, get_stat_factory(median_error))
@@ -0,0 +1,113 @@
+from datetime import date
+import gzip
+import pytest
+from log_analyzer.checkpoint import CheckpointStore
+from log_analyzer.path import LogPath
+from log_analyzer.report import ReportBuilder
+
+
+def test_ReportBuilder__incremental(log_directory, reports_result_directory, tmp_path):
+    # arrange
+    # The last line is complete only with a newline, a growing log may be in the middle of writing it
+    data = gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz').read() + b'\n'
+    log_path = LogPath(path=tmp_path / 'nginx-access-ui.log-20230101', date=date(2023, 1, 1), extension=None)
+    log_path.path.write_bytes(data[:data.index(b'banner/2/')])
+    store = CheckpointStore(tmp_path / 'checkpoints')
+    builder = ReportBuilder(
+        report_directory=tmp_path,
+        report_date=date(2023, 1, 1),
+        report_size=5,
+        unparsed_logs_coef=1,
+        checkpoint_store=store,
+    )
+    builder.build(log_path)
+    with open(log_path.path, 'ab') as file:
+        file.write(data[data.index(b'banner/2/'):])
+
+    # act
+    builder.build(log_path)
+
+    # assert
+    assert builder.path.read_text() == (reports_result_directory / 'report-2023.01.01.html').read_text()
+    checkpoint = store.load(log_path, median_error=None)
+    assert checkpoint.position.offset == log_path.path.stat().st_size
+    assert checkpoint.unparsed == 2
+
+
+
+def test_ReportBuilder__incremental_finished_log(log_directory, reports_result_directory, tmp_path):
+    # arrange
+    data = gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz').read()
+    log_path = LogPath(path=tmp_path / 'nginx-access-ui.log-20230101', date=date(2023, 1, 1), extension=None)
+    log_path.path.write_bytes(data.rstrip(b'\n'))
+    store = CheckpointStore(tmp_path / 'checkpoints')
+    builder = ReportBuilder(
+        report_directory=tmp_path,
+        report_date=date(2023, 1, 1),
+        report_size=5,
+        unparsed_logs_coef=1,
+        checkpoint_store=store,
+    )
+    builder.build(log_path)
+
+    # act
+    builder.build(log_path)
+
+    # assert
+    assert builder.path.read_text() == (reports_result_directory / 'report-2023.01.01.html').read_text()
+    checkpoint = store.load(log_path, median_error=None)
+    assert checkpoint.position.offset == log_path.path.stat().st_size
+
+def test_CheckpointStore_load__other_median_error(log_directory, tmp_path):
+    # arrange
+    log_path = LogPath(path=tmp_path / 'nginx-access-ui.log-20230101', date=date(2023, 1, 1), extension=None)
+    log_path.path.write_bytes(gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz').read())
+    store = CheckpointStore(tmp_path / 'checkpoints')
+    builder = ReportBuilder(
+        report_directory=tmp_path,
+        report_date=date(2023, 1, 1),
+        report_size=5,
+        unparsed_logs_coef=1,
+        checkpoint_store=store,
+    )
+    builder.build(log_path)
+
+    # act
+    checkpoint = store.load(log_path, median_error=0.01)
+
+    # assert
+    assert store.load(log_path, median_error=None)
+    assert checkpoint is None
+
+
+def test_CheckpointStore_load__other_backend(log_directory, tmp_path):
+    # arrange
+    pytest.importorskip('numpy')
+    log_path = LogPath(path=tmp_path / 'nginx-access-ui.log-20230101', date=date(2023, 1, 1), extension=None)
+    log_path.path.write_bytes(gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz').read())
+    store = CheckpointStore(tmp_path / 'checkpoints')
+    builder = ReportBuilder(
+        report_directory=tmp_path,
+        report_date=date(2023, 1, 1),
+        report_size=5,
+        unparsed_logs_coef=1,
+        checkpoint_store=store,
+    )
+    builder.build(log_path)
+    numpy_builder = ReportBuilder(
+        report_directory=tmp_path,
+        report_date=date(2023, 1, 1),
+        report_size=5,
+        unparsed_logs_coef=1,
+        checkpoint_store=store,
+        backend='numpy',
+    )
+
+    # act
+    checkpoint = store.load(log_path, median_error=None, backend='numpy')
+    numpy_builder.build(log_path)
+
+    # assert
+    assert checkpoint is None
+    assert store.load(log_path, median_error=None, backend='numpy')
+    assert store.load(log_path, median_error=None) is None
@@ -0,0 +1,72 @@
+from datetime import date
+import gzip
+from pathlib import Path
+import zipfile
+from log_analyzer.columnar import load_columns, read_columns, save_columns
+from log_analyzer.parser import LogParser
+from log_analyzer.report import ReportBuilder
+from log_analyzer.stat import ApproximateUrlStat, UrlsStat
+
+
+def test_save_columns(log_directory, tmp_path):
+    # arrange
+    urls_stat = UrlsStat()
+    unparsed = urls_stat.add_lines(LogParser(gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz', 'rt')))
+    path = tmp_path / 'report-2023.01.01.npz'
+
+    # act
+    save_columns(path, urls_stat, unparsed)
+    columns = read_columns(path)
+    loaded = load_columns(path)
+
+    # assert
+    assert loaded.entries == urls_stat.entries
+    assert loaded.sum == urls_stat.sum
+    assert loaded.unparsed == 2
+    assert [(url, stat.entries, stat.sum, stat.max, stat.median) for url, stat in loaded.top(3)] == [
+        (url, stat.entries, stat.sum, stat.max, stat.median) for url, stat in urls_stat.top(3)
+    ]
+    assert [loaded.url(url_id) for url_id in columns['url_id']] == [
+        url for url, stat in urls_stat.items() for _ in range(stat.entries)
+    ]
+    assert list(columns['request_time']) == [time for stat in urls_stat.values() for time in stat.times]
+
+
+def test_save_columns__npy_layout(tmp_path):
+    # arrange
+    urls_stat = UrlsStat(ApproximateUrlStat)
+    urls_stat['/api/v1/banner/1/'] += 1.5
+    path = tmp_path / 'report-2023.01.01.npz'
+
+    # act
+    save_columns(path, urls_stat, unparsed=0)
+    columns = read_columns(path)
+
+    # assert
+    assert 'request_time' not in columns
+    assert list(columns['time_sum']) == [1.5]
+    npy = zipfile.ZipFile(path).read('time_sum.npy')
+    assert npy.startswith(b'\x93NUMPY\x01\x00')
+    assert npy[10:].startswith(b"{'descr': '<f8', 'fortran_order': False, 'shape': (1,)}")
+    assert (len(npy) - 8) % 64 == 0
+
+
+def test_ReportBuilder__from_columns(log_directory, reports_result_directory, tmp_path):
+    # arrange
+    log_path = Path(log_directory / 'nginx-access-ui.log-20230101.gz')
+    builder = ReportBuilder(
+        report_directory=tmp_path,
+        report_date=date(2023, 1, 1),
+        report_size=5,
+        unparsed_logs_coef=1,
+        save_columns=True,
+    )
+    builder.build(LogParser(gzip.open(log_path, 'rt')))
+    builder.path.unlink()
+
+    # act
+    builder.build('logs are not read')
+
+    # assert
+    assert builder.columns_path.is_file()
+    assert builder.path.read_text() == (reports_result_directory / 'report-2023.01.01.html').read_text()
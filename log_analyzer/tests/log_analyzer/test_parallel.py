@@ -0,0 +1,57 @@
+from datetime import date
+import gzip
+from log_analyzer.parallel import read_logs_parallel, _split
+from log_analyzer.parser import LogParser
+from log_analyzer.path import LogPath
+from log_analyzer.stat import UrlsStat
+
+
+def _read_logs(log_path):
+    urls_stat = UrlsStat()
+    open_method = gzip.open if log_path.extension == '.gz' else open
+    unparsed = urls_stat.add_lines(LogParser(open_method(log_path.path, 'rt')))
+    return urls_stat, unparsed
+
+
+def _summary(urls_stat):
+    return {url: (stat.entries, round(stat.sum, 3), stat.max, stat.median) for url, stat in urls_stat.items()}
+
+
+def test_read_logs_parallel__plain(log_directory, tmp_path):
+    # arrange
+    path = tmp_path / 'nginx-access-ui.log-20230101'
+    path.write_bytes(gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz').read())
+    log_path = LogPath(path=path, date=date(2023, 1, 1), extension=None)
+    expected_stat, expected_unparsed = _read_logs(log_path)
+
+    # act
+    urls_stat, unparsed = read_logs_parallel(log_path, workers=3, urls_stat_factory=UrlsStat)
+
+    # assert
+    assert unparsed == expected_unparsed == 2
+    assert _summary(urls_stat) == _summary(expected_stat)
+
+
+def test_read_logs_parallel__gz(log_directory):
+    # arrange
+    log_path = LogPath(path=log_directory / 'nginx-access-ui.log-20230101.gz', date=date(2023, 1, 1), extension='.gz')
+    expected_stat, expected_unparsed = _read_logs(log_path)
+
+    # act
+    urls_stat, unparsed = read_logs_parallel(log_path, workers=2, urls_stat_factory=UrlsStat)
+
+    # assert
+    assert unparsed == expected_unparsed == 2
+    assert _summary(urls_stat) == _summary(expected_stat)
+
+
+def test_split(tmp_path):
+    # arrange
+    path = tmp_path / 'log'
+    path.write_bytes(b'first line\nsecond\nthird line is longer\n')
+
+    # act
+    ranges = _split(path, 3)
+
+    # assert
+    assert ranges == [(0, 18), (18, 39)]
@@ -1,5 +1,5 @@
 import gzip
-from log_analyzer.parser import LogParser, LogLine
+from log_analyzer.parser import BytesLogParser, LogParser, LogLine, normalize_url
 
 
 def test_LogParser(log_directory):
@@ -22,3 +22,67 @@ def test_LogParser(log_directory):
         LogLine(url='/api/v1/banner/5/', request_time=6.1),
         LogLine(url='/api/v1/banner/6/', request_time=0.8),
     ]
+
+
+def test_LogParser__regex_fallback():
+    # arrange
+    lines = [
+        '1.2.3.4 -  - [01/Jun/2023:12:00:00 +0300] "GET /api/v1/banner/1/ HTTP/1.1" 200 123 "-" "Python "urllib"" "-" "1234-567" "abcdef" 1.2\n',
+        '1.2.3.4 -  - [01/Jun/2023:12:00:00 +0300] "GET /api/v1/banner/1/ HTTP/1.1" 200 123 "-" "Python/urllib" "-" "1234-567" "abcdef" 0.5 seconds\n',
+    ]
+    parser = LogParser(iter(lines))
+
+    # act
+    fast_result = [parser._parse_fast(line) for line in lines]
+    result = list(parser)
+
+    # assert
+    assert fast_result == [None, None]
+    assert result == [
+        LogLine(url='/api/v1/banner/1/', request_time=1.2),
+        LogLine(url='/api/v1/banner/1/', request_time=0.5),
+    ]
+
+
+def test_BytesLogParser(log_directory):
+    # arrange
+    lines = gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz', 'rt').readlines()
+    parser = BytesLogParser(line.encode() for line in lines)
+
+    # act
+    result = list(parser)
+
+    # assert
+    assert result == list(LogParser(iter(lines)))
+
+
+def test_normalize_url():
+    # arrange
+    urls = [
+        '/api/v2/banner/25019354',
+        '/api/v2/slot/4705/groups?server_name=WIN7RB4',
+        '/api/v2/internal/html5/phantomjs/queue/?wait=1m',
+        '/accounts/550e8400-e29b-41d4-a716-446655440000/photo/7b4fe3a2c1d0e9f8',
+    ]
+
+    # act
+    result = [normalize_url(url) for url in urls]
+
+    # assert
+    assert result == [
+        '/api/v2/banner/{id}',
+        '/api/v2/slot/{id}/groups',
+        '/api/v2/internal/html5/phantomjs/queue/',
+        '/accounts/{id}/photo/{id}',
+    ]
+
+
+def test_LogParser__normalize_urls(log_directory):
+    # arrange
+    parser = BytesLogParser(gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz', 'rb'), normalize_urls=True)
+
+    # act
+    result = {line.url for line in parser if line}
+
+    # assert
+    assert result == {'/api/v1/banner/{id}/'}
@@ -1,5 +1,6 @@
 from datetime import date
-from log_analyzer.path import get_log_path, LogPath, _get_log_paths
+import gzip
+from log_analyzer.path import get_log_path, get_log_paths, LogPath, LogPosition, LogReader, _get_log_paths
 
 
 def test_get_log_path(log_directory):
@@ -10,6 +11,17 @@ def test_get_log_path(log_directory):
     assert path == LogPath(path=log_directory / 'nginx-access-ui.log-20230104.gz', date=date(2023, 1, 4), extension='.gz')
 
 
+def test_get_log_paths__date_range(log_directory):
+    # act
+    paths = get_log_paths(log_directory, date_from=date(2023, 1, 2), date_to=date(2023, 1, 4), pattern='*.gz')
+
+    # assert
+    assert paths == [
+        LogPath(path=log_directory / 'nginx-access-ui.log-20230102.gz', date=date(2023, 1, 2), extension='.gz'),
+        LogPath(path=log_directory / 'nginx-access-ui.log-20230104.gz', date=date(2023, 1, 4), extension='.gz'),
+    ]
+
+
 def test_get_log_paths(log_directory):
     # act
     paths = _get_log_paths(log_directory)
@@ -21,3 +33,77 @@ def test_get_log_paths(log_directory):
         LogPath(path=log_directory / 'nginx-access-ui.log-20230103', date=date(2023, 1, 3), extension=None),
         LogPath(path=log_directory / 'nginx-access-ui.log-20230104.gz', date=date(2023, 1, 4), extension='.gz'),
     }
+
+
+def test_LogPath_read_blocks(log_directory, tmp_path):
+    # arrange
+    lines = gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz').read().splitlines()
+    plain_path = tmp_path / 'nginx-access-ui.log-20230101'
+    plain_path.write_bytes(b'\n'.join(lines) + b'\n')
+    # Every line is a separate gzip member, as if the log was appended by parts
+    compressed_path = tmp_path / 'nginx-access-ui.log-20230101.gz'
+    compressed_path.write_bytes(b''.join(gzip.compress(line + b'\n') for line in lines))
+    plain = LogPath(path=plain_path, date=date(2023, 1, 1), extension=None)
+    compressed = LogPath(path=compressed_path, date=date(2023, 1, 1), extension='.gz')
+
+    # act
+    plain_blocks = list(plain.read_blocks(read_size=16))
+    compressed_blocks = list(compressed.read_blocks(read_size=16))
+
+    # assert
+    assert all(block.endswith(b'\n') for block in plain_blocks + compressed_blocks)
+    assert b''.join(plain_blocks) == b''.join(compressed_blocks) == plain_path.read_bytes()
+
+
+def test_LogPath_read_blocks__empty(log_directory):
+    # arrange
+    log_path = LogPath(path=log_directory / 'nginx-access-ui.log-20230103', date=date(2023, 1, 3), extension=None)
+
+    # act
+    blocks = list(log_path.read_blocks())
+
+    # assert
+    assert blocks == []
+
+
+def test_LogReader__growing_plain(tmp_path):
+    # arrange
+    path = tmp_path / 'nginx-access-ui.log-20230101'
+    path.write_bytes(b'first\nsecond\nthi')
+    log_path = LogPath(path=path, date=date(2023, 1, 1), extension=None)
+    reader = LogReader(log_path, read_size=4, growing=True)
+    first_blocks = list(reader.read_blocks())
+    with open(path, 'ab') as file:
+        file.write(b'rd\nfourth\n')
+
+    # act
+    next_reader = LogReader(log_path, reader.position, growing=True)
+    next_blocks = list(next_reader.read_blocks())
+
+    # assert
+    assert b''.join(first_blocks) == b'first\nsecond\n'
+    assert reader.position == LogPosition(offset=13)
+    assert b''.join(next_blocks) == b'third\nfourth\n'
+    assert next_reader.position == LogPosition(offset=26)
+
+
+def test_LogReader__growing_gz(tmp_path):
+    # arrange
+    path = tmp_path / 'nginx-access-ui.log-20230101.gz'
+    first_member = gzip.compress(b'first\nsecond\nthi')
+    path.write_bytes(first_member)
+    log_path = LogPath(path=path, date=date(2023, 1, 1), extension='.gz')
+    reader = LogReader(log_path, read_size=8, growing=True)
+    first_blocks = list(reader.read_blocks())
+    with open(path, 'ab') as file:
+        file.write(gzip.compress(b'rd\nfourth\n') + gzip.compress(b'fifth\n'))
+
+    # act
+    next_reader = LogReader(log_path, reader.position, read_size=8, growing=True)
+    next_blocks = list(next_reader.read_blocks())
+
+    # assert
+    assert b''.join(first_blocks) == b'first\nsecond\n'
+    assert reader.position == LogPosition(offset=0, skip=13)
+    assert b''.join(next_blocks) == b'third\nfourth\nfifth\n'
+    assert next_reader.position == LogPosition(offset=path.stat().st_size - len(gzip.compress(b'fifth\n')), skip=6)
@@ -0,0 +1,74 @@
+from datetime import date
+import gzip
+import pstats
+from log_analyzer.path import LogPath
+from log_analyzer.profiling import PipelineStats, profile
+from log_analyzer.report import ReportBuilder
+
+
+def test_PipelineStats_read():
+    # arrange
+    stats = PipelineStats(progress_interval=0)
+    blocks = iter([b'first\nsecond\n', b'third\n'])
+
+    # act
+    for block in stats.read(blocks):
+        stats.add_lines(block.count(b'\n'))
+
+    # assert
+    assert stats.lines == 3
+    assert stats.bytes == 19
+    assert set(stats.timings) == {'read'}
+
+
+def test_ReportBuilder__stages(log_directory, tmp_path):
+    # arrange
+    log_path = LogPath(path=log_directory / 'nginx-access-ui.log-20230101.gz', date=date(2023, 1, 1), extension='.gz')
+    builder = ReportBuilder(report_directory=tmp_path, report_date=date(2023, 1, 1), report_size=5, unparsed_logs_coef=1)
+
+    # act
+    builder.build(log_path)
+
+    # assert
+    assert set(builder.stats.timings) == {'read', 'parse', 'aggregate', 'render', 'write'}
+    assert builder.stats.lines == 10
+
+
+def test_ReportBuilder__stages_parallel(log_directory, tmp_path):
+    # arrange
+    data = gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz').read()
+    plain = LogPath(path=tmp_path / 'nginx-access-ui.log-20230101', date=date(2023, 1, 1), extension=None)
+    plain.path.write_bytes(data)
+    compressed = LogPath(path=log_directory / 'nginx-access-ui.log-20230101.gz', date=date(2023, 1, 1), extension='.gz')
+    builders = [
+        ReportBuilder(report_directory=tmp_path / str(index), report_date=date(2023, 1, 1), report_size=5,
+                      unparsed_logs_coef=1, workers=2)
+        for index in range(3)
+    ]
+    for builder in builders:
+        builder.path.parent.mkdir()
+
+    # act
+    builders[0].build(plain)
+    builders[1].build(compressed)
+    builders[2].build([plain, compressed])
+
+    # assert
+    assert [(builder.stats.lines, builder.stats.bytes) for builder in builders] == [
+        (10, len(data)),
+        (10, len(data)),
+        (20, 2 * len(data)),
+    ]
+    assert all('parallel read' in builder.stats.timings for builder in builders)
+
+
+def test_profile(tmp_path):
+    # arrange
+    path = tmp_path / 'log_analyzer.prof'
+
+    # act
+    with profile(path):
+        sorted(range(1000), key=str)
+
+    # assert
+    assert pstats.Stats(str(path)).total_calls > 0
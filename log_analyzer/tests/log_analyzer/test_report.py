@@ -2,6 +2,7 @@ from datetime import date
 import gzip
 from pathlib import Path
 from log_analyzer.parser import LogParser
+from log_analyzer.path import LogPath
 from log_analyzer.report import ReportBuilder
 
 
@@ -50,3 +51,29 @@ def test_ReportBuilder__report_exists(mocker, reports_directory):
     assert builder._is_report_exists
     builder._read_logs.assert_not_called()
 
+
+
+def test_ReportBuilder__several_logs(log_directory, tmp_path):
+    # arrange
+    first_log = LogPath(path=log_directory / 'nginx-access-ui.log-20230101.gz', date=date(2023, 1, 1), extension='.gz')
+    second_log = LogPath(path=tmp_path / 'nginx-access-ui.log-20230102', date=date(2023, 1, 2), extension=None)
+    second_log.path.write_bytes(gzip.open(first_log.path).read())
+    builder = ReportBuilder(
+        report_directory=tmp_path,
+        report_date=date(2023, 1, 1),
+        report_size=5,
+        unparsed_logs_coef=1,
+        workers=2,
+        report_end_date=date(2023, 1, 2),
+    )
+
+    # act
+    urls_stat, unparsed = builder._read_logs([first_log, second_log])
+    builder.build([first_log, second_log])
+
+    # assert
+    assert builder.path == tmp_path / 'report-2023.01.01-2023.01.02.html'
+    assert builder.path.is_file()
+    assert unparsed == 4
+    assert urls_stat['/api/v1/banner/1/'].entries == 4
+    assert urls_stat['/api/v1/banner/5/'].max == 6.1
@@ -0,0 +1,102 @@
+import random
+import statistics
+import pytest
+from log_analyzer.stat import ApproximateUrlStat, ExactUrlStat, get_urls_stat_factory, UrlStat, UrlsStat
+
+
+def test_ExactUrlStat():
+    # arrange
+    stat = ExactUrlStat()
+
+    # act
+    for time in [1.2, 0.4, 5.5, 1.6]:
+        stat += time
+
+    # assert
+    assert stat.entries == 4
+    assert stat.sum == 8.7
+    assert stat.max == 5.5
+    assert stat.average == 8.7 / 4
+    assert stat.median == 1.4
+
+
+def test_ApproximateUrlStat__median_error():
+    # arrange
+    random.seed(0)
+    times = [random.lognormvariate(0, 1.5) for _ in range(10001)]
+    stat = ApproximateUrlStat(relative_error=0.01)
+
+    # act
+    for time in times:
+        stat += time
+
+    # assert
+    assert stat.entries == len(times)
+    assert stat.max == max(times)
+    assert abs(stat.median - statistics.median(times)) <= 0.01 * statistics.median(times)
+
+
+def test_ApproximateUrlStat__zero_times():
+    # arrange
+    stat = ApproximateUrlStat()
+
+    # act
+    for time in [0.0, 0.0, 0.0, 2.0]:
+        stat += time
+
+    # assert
+    assert stat.median == 0.0
+    assert abs(stat.quantile(1) - 2.0) <= 0.01 * 2.0
+
+
+def test_UrlStat_merge():
+    # arrange
+    times = [0.3, 1.2, 0.8, 2.5, 0.1]
+    exact, exact_part = ExactUrlStat(), ExactUrlStat()
+    approximate, approximate_part = ApproximateUrlStat(), ApproximateUrlStat()
+    for time in times[:2]:
+        exact += time
+        approximate += time
+    for time in times[2:]:
+        exact_part += time
+        approximate_part += time
+
+    # act
+    exact.merge(exact_part)
+    approximate.merge(approximate_part)
+
+    # assert
+    assert exact.entries == approximate.entries == 5
+    assert exact.max == approximate.max == 2.5
+    assert exact.median == 0.8
+    assert abs(approximate.median - 0.8) <= 0.01 * 0.8
+
+
+def test_UrlsStat__stat_factory():
+    # arrange
+    urls_stat = UrlsStat(ApproximateUrlStat)
+
+    # act
+    urls_stat['/api/v1/banner/1/'] += 1.0
+
+    # assert
+    assert isinstance(urls_stat['/api/v1/banner/1/'], ApproximateUrlStat)
+    assert urls_stat.sum == 1.0
+
+
+def test_get_urls_stat_factory__errors():
+    # act, assert
+    with pytest.raises(ValueError):
+        get_urls_stat_factory(median_error=0.01, backend='numpy')
+    with pytest.raises(ValueError):
+        get_urls_stat_factory(backend='pandas')
+    with pytest.raises(ValueError):
+        get_urls_stat_factory(median_error=0)
+    with pytest.raises(ValueError):
+        get_urls_stat_factory(median_error=1)
+
+
+def test_UrlStat__abstract():
+    # act, assert
+    with pytest.raises(TypeError):
+        UrlStat()
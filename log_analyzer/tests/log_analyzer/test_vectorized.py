@@ -0,0 +1,70 @@
+from datetime import date
+import gzip
+import random
+import pytest
+from log_analyzer.parser import LogLine, LogParser
+from log_analyzer.report import ReportBuilder
+from log_analyzer.stat import UrlsStat
+
+pytest.importorskip('numpy')
+from log_analyzer.vectorized import NumpyUrlsStat  # noqa: E402
+
+
+def _summary(urls_stat):
+    return [(url, stat.entries, stat.sum, stat.max, stat.median, stat.average) for url, stat in urls_stat.items()]
+
+
+def test_NumpyUrlsStat(monkeypatch):
+    # arrange
+    random.seed(0)
+    lines = [
+        LogLine(url=f'/api/v2/banner/{random.randrange(50)}', request_time=round(random.lognormvariate(-1, 1), 3))
+        for _ in range(10000)
+    ] + [None]
+    monkeypatch.setattr(NumpyUrlsStat, 'BATCH_SIZE', 1000)
+    expected = UrlsStat()
+    expected_unparsed = expected.add_lines(lines)
+    urls_stat = NumpyUrlsStat()
+
+    # act
+    unparsed = urls_stat.add_lines(lines)
+
+    # assert
+    assert unparsed == expected_unparsed == 1
+    assert urls_stat.entries == expected.entries
+    assert urls_stat.sum == expected.sum
+    assert _summary(urls_stat) == _summary(expected)
+    assert [url for url, _ in urls_stat.top(5)] == [url for url, _ in expected.top(5)]
+
+
+def test_NumpyUrlsStat_merge(log_directory):
+    # arrange
+    lines = list(LogParser(gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz', 'rt')))
+    expected = UrlsStat()
+    expected.add_lines(lines)
+    urls_stat, other = NumpyUrlsStat(), NumpyUrlsStat()
+    urls_stat.add_lines(lines[:5])
+    other.add_lines(lines[5:])
+
+    # act
+    urls_stat.merge(other)
+
+    # assert
+    assert _summary(urls_stat) == _summary(expected)
+
+
+def test_ReportBuilder__numpy_backend(log_directory, reports_result_directory, tmp_path):
+    # arrange
+    builder = ReportBuilder(
+        report_directory=tmp_path,
+        report_date=date(2023, 1, 1),
+        report_size=5,
+        unparsed_logs_coef=1,
+        backend='numpy',
+    )
+
+    # act
+    builder.build(LogParser(gzip.open(log_directory / 'nginx-access-ui.log-20230101.gz', 'rt')))
+
+    # assert
+    assert builder.path.read_text() == (reports_result_directory / 'report-2023.01.01.html').read_text()
@@ -1,6 +1,6 @@
 import collections
 import glob
-import gzip
+from itertools import cycle
 import logging
 from multiprocessing import Pool, cpu_count
 from optparse import OptionParser
@@ -9,6 +9,7 @@ import sys
 from threading import Thread
 import time
 from queue import Queue, Empty
+import zlib
 
 import memcache
 
@@ -19,17 +20,27 @@ NORMAL_ERR_RATE = 0.01
 AppsInstalled = collections.namedtuple('AppsInstalled',
                                        ['dev_type', 'dev_id', 'lat', 'lon', 'apps'])
 SENTINEL = object()
-CHUNK_SIZE = 50
+# Asks a writer to report what it has written since the previous report
+FLUSH = object()
+# A chunk is sent when it has CHUNK_SIZE keys or CHUNK_BYTES of keys and values, whichever comes first
+CHUNK_SIZE = 500
+CHUNK_BYTES = 64 * 1024
+# Compressed bytes read at once, a block is decompressed to several megabytes of lines
+READ_SIZE = 1024 * 1024
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+# Blocks waiting for parsing, blocks parsed in worker processes and chunks waiting for a writer
+QUEUE_SIZE = 16
 
 
 class MemcacheWriter(Thread):
-    def __init__(self, job_queue, result_queue, memc, dry_run=False, attempts=1):
+    def __init__(self, job_queue, result_queue, memc, dry_run=False, attempts=1, noreply=False):
         super().__init__()
         self.job_queue = job_queue
         self.result_queue = result_queue
         self.memc = memc
         self.dry_run = dry_run
         self.attempts = attempts
+        self.noreply = noreply
         self.daemon = True
 
     def run(self):
@@ -38,10 +49,13 @@ class MemcacheWriter(Thread):
         while True:
             try:
                 chunks = self.job_queue.get(timeout=0.1)
-                if chunks == SENTINEL:
-                    self.result_queue.put((processed, errors))
+                if chunks is SENTINEL:
+                    self.memc.disconnect_all()
                     logging.info('[Worker %s] Stop thread: %s' % (os.getpid(), self.name))
                     break
+                elif chunks is FLUSH:
+                    self.result_queue.put((processed, errors))
+                    processed = errors = 0
                 else:
                     proc_items, err_items = self.insert_appsinstalled(chunks)
                     processed += proc_items
@@ -63,10 +77,10 @@ class MemcacheWriter(Thread):
         return processed, errors
 
     def memcache_set(self, memc, chunks):
-        failed_keys = memc.set_multi(chunks)
+        failed_keys = self.set_multi(memc, chunks)
         attempts = 0
         while failed_keys and attempts < self.attempts:
-            failed_keys = memc.set_multi({
+            failed_keys = self.set_multi(memc, {
                 key: chunks[key]
                 for key in failed_keys
             })
@@ -75,6 +89,107 @@ class MemcacheWriter(Thread):
         errors = len(failed_keys)
         return len(chunks.keys()) - errors, errors
 
+    def set_multi(self, memc, chunks):
+        if not self.noreply:
+            return memc.set_multi(chunks)
+        # With noreply the next chunk is sent without waiting for the replies to this one and
+        # set_multi reports nothing: keys of a dead server are skipped, failed sends only mark it dead.
+        # So the whole chunk is counted as failed when the server is dead after sending it
+        memc.set_multi(chunks, noreply=True)
+        if any(server.deaduntil > time.time() for server in memc.servers):
+            return list(chunks)
+        return []
+
+
+class MemcachePool:
+    # Writer threads are kept for all files, so are their connections: memcache.Client keeps
+    # a socket per thread. Every server gets several writers, each with its own queue
+    def __init__(self, device_memc, connections=1, dry_run=False, attempts=1, noreply=False):
+        self.dev_types = tuple(device_memc)
+        self.result_queue = Queue()
+        self.job_queues = {}
+        self.writers = []
+        for dev_type, memc_addr in device_memc.items():
+            self.job_queues[dev_type] = []
+            for _ in range(connections):
+                job_queue = Queue(maxsize=QUEUE_SIZE)
+                writer = MemcacheWriter(job_queue, self.result_queue, memcache.Client([memc_addr]),
+                                        dry_run, attempts, noreply)
+                self.job_queues[dev_type].append(job_queue)
+                self.writers.append(writer)
+                writer.start()
+        self.next_queue = {dev_type: cycle(job_queues) for dev_type, job_queues in self.job_queues.items()}
+
+    def put(self, dev_type, chunk):
+        next(self.next_queue[dev_type]).put(chunk)
+
+    def flush(self):
+        # Waits until every writer has written the chunks put before
+        processed = errors = 0
+        for job_queues in self.job_queues.values():
+            for job_queue in job_queues:
+                job_queue.put(FLUSH)
+        for _ in self.writers:
+            result = self.result_queue.get()
+            processed += result[0]
+            errors += result[1]
+        return processed, errors
+
+    def close(self):
+        for job_queues in self.job_queues.values():
+            for job_queue in job_queues:
+                job_queue.put(SENTINEL)
+        for writer in self.writers:
+            writer.join()
+
+
+class BlockReader(Thread):
+    def __init__(self, fn, block_queue, read_size=READ_SIZE):
+        super().__init__()
+        self.fn = fn
+        self.block_queue = block_queue
+        self.read_size = read_size
+        self.error = None
+        self.daemon = True
+
+    def run(self):
+        try:
+            for block in read_blocks(self.fn, self.read_size):
+                self.block_queue.put(block)
+        except Exception as e:
+            logging.exception('Cannot read %s: %s' % (self.fn, e))
+            self.error = e
+        finally:
+            self.block_queue.put(SENTINEL)
+
+
+def read_blocks(fn, read_size=READ_SIZE):
+    # Blocks of whole lines, the incomplete last line of a block is carried over to the next one
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    tail = b''
+    consumed = False
+    with open(fn, 'rb') as fd:
+        while True:
+            data = fd.read(read_size)
+            if not data:
+                break
+            consumed = True
+            block = tail + decompressor.decompress(data)
+            # Concatenated gzip members are decompressed one after another
+            while decompressor.eof and decompressor.unused_data:
+                data = decompressor.unused_data
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+                block += decompressor.decompress(data)
+            end = block.rfind(b'\n') + 1
+            tail = block[end:]
+            if end:
+                yield block[:end]
+    # An empty file has no lines, like with gzip.open
+    if consumed and not decompressor.eof:
+        raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+    if tail:
+        yield tail
+
 
 def dot_rename(path):
     head, fn = os.path.split(path)
@@ -111,32 +226,18 @@ def serialize_appsinstalled(appsinstalled):
     return (key, packed)
 
 
-def file_handler(fn, options):
-    device_memc = {
-        'idfa': options.idfa,
-        'gaid': options.gaid,
-        'adid': options.adid,
-        'dvid': options.dvid,
-    }
-
-    thread_pool = {}
-    job_pool = {}
-    result_queue = Queue()
-    chunks = {}
-    for dev_type, memc_addr in device_memc.items():
-        memc = memcache.Client([memc_addr])
-        job_pool[dev_type] = Queue()
-        worker = MemcacheWriter(job_pool[dev_type], result_queue, memc, options.dry,
-                                options.attempts)
-        thread_pool[dev_type] = worker
-        chunks[dev_type] = {}
-        worker.start()
-
-    processed = errors = 0
-    logging.info('[Worker %s] Processing %s' % (os.getpid(), fn))
-    fd = gzip.open(fn)
-    for line in fd:
-        line = line.decode().strip()
+def parse_block(block, dev_types, chunk_size=CHUNK_SIZE, chunk_bytes=CHUNK_BYTES):
+    # Runs in a worker process, so both parsing and serialization are spread across cores
+    chunks = []
+    pending = {dev_type: {} for dev_type in dev_types}
+    pending_bytes = dict.fromkeys(dev_types, 0)
+    errors = 0
+    # Only a newline ends a line, str.splitlines would split on other separators inside a record too
+    lines = block.decode().split('\n')
+    if not lines[-1]:
+        lines.pop()
+    for line in lines:
+        line = line.strip()
         if not line:
             continue
         appsinstalled = parse_appsinstalled(line)
@@ -144,33 +245,60 @@ def file_handler(fn, options):
             errors += 1
             continue
         dev_type = appsinstalled.dev_type
-        if dev_type not in device_memc:
+        if dev_type not in pending:
             errors += 1
             logging.error('Unknown device type: %s' % appsinstalled.dev_type)
             continue
 
         key, value = serialize_appsinstalled(appsinstalled)
-        chunk = chunks[dev_type]
+        chunk = pending[dev_type]
         chunk[key] = value
-        if len(chunk.keys()) == CHUNK_SIZE:
-            job_pool[dev_type].put(chunk)
-            chunks[dev_type] = {}
+        pending_bytes[dev_type] += len(key) + len(value)
+        if len(chunk) >= chunk_size or pending_bytes[dev_type] >= chunk_bytes:
+            chunks.append((dev_type, chunk))
+            pending[dev_type] = {}
+            pending_bytes[dev_type] = 0
 
-    for dev_type, chunk in chunks.items():
+    for dev_type, chunk in pending.items():
         if chunk:
-            job_pool[dev_type].put(chunk)
+            chunks.append((dev_type, chunk))
+    return chunks, errors
+
+
+def dispatch_chunks(parsed, memc_pool):
+    chunks, errors = parsed
+    for dev_type, chunk in chunks:
+        memc_pool.put(dev_type, chunk)
+    return errors
 
-    for q in job_pool.values():
-        q.put(SENTINEL)
-    for t in thread_pool.values():
-        t.join()
-    while not result_queue.empty():
-        result = result_queue.get(timeout=0.1)
-        processed += result[0]
-        errors += result[1]
+
+def file_handler(fn, options, pool, memc_pool):
+    errors = 0
+    logging.info('[Worker %s] Processing %s' % (os.getpid(), fn))
+    # Reader thread -> blocks queue -> parsing processes -> chunks queues -> writer threads,
+    # every stage waits when the next one falls behind, so memory stays bounded
+    block_queue = Queue(maxsize=QUEUE_SIZE)
+    reader = BlockReader(fn, block_queue)
+    reader.start()
+    parsing = collections.deque()
+    parse_args = (memc_pool.dev_types, options.chunk_size, options.chunk_bytes)
+    while True:
+        block = block_queue.get()
+        if block is SENTINEL:
+            break
+        parsing.append(pool.apply_async(parse_block, (block, *parse_args)))
+        if len(parsing) >= QUEUE_SIZE:
+            errors += dispatch_chunks(parsing.popleft().get(), memc_pool)
+    while parsing:
+        errors += dispatch_chunks(parsing.popleft().get(), memc_pool)
+    reader.join()
+    if reader.error:
+        raise reader.error
+
+    processed, write_errors = memc_pool.flush()
+    errors += write_errors
 
     if not processed:
-        fd.close()
         return fn
 
     err_rate = float(errors) / processed
@@ -178,19 +306,26 @@ def file_handler(fn, options):
         logging.info('Acceptable error rate (%s). Successfull load' % err_rate)
     else:
         logging.error('High error rate (%s > %s). Failed load' % (err_rate, NORMAL_ERR_RATE))
-    fd.close()
     return fn
 
 
 def main(options):
-    pool = Pool(int(options.workers))
-    process_args = (
-        (file_name, options)
-        for file_name in sorted(glob.iglob(options.pattern))
-    )
-    for fn in pool.starmap(file_handler, process_args):
-        logging.info('Renaming %s' % fn)
-        dot_rename(fn)
+    device_memc = {
+        'idfa': options.idfa,
+        'gaid': options.gaid,
+        'adid': options.adid,
+        'dvid': options.dvid,
+    }
+    memc_pool = MemcachePool(device_memc, options.connections, options.dry, options.attempts, options.noreply)
+    # Files are loaded one after another, the lines of every file are parsed by all processes of the pool
+    try:
+        with Pool(int(options.workers)) as pool:
+            for file_name in sorted(glob.iglob(options.pattern)):
+                fn = file_handler(file_name, options, pool, memc_pool)
+                logging.info('Renaming %s' % fn)
+                dot_rename(fn)
+    finally:
+        memc_pool.close()
 
 
 def prototest():
@@ -222,6 +357,10 @@ if __name__ == '__main__':
     op.add_option('--dvid', action='store', default='127.0.0.1:33016')
     op.add_option('-w', '--workers', action='store', type=int, default=cpu_count() + 1)
     op.add_option('-a', '--attempts', action='store', type=int, default=3)
+    op.add_option('-c', '--connections', action='store', type=int, default=2)
+    op.add_option('--chunk-size', action='store', type=int, default=CHUNK_SIZE)
+    op.add_option('--chunk-bytes', action='store', type=int, default=CHUNK_BYTES)
+    op.add_option('--noreply', action='store_true', default=False)
     (opts, args) = op.parse_args()
     logging.basicConfig(filename=opts.log,
                         level=logging.INFO if not opts.dry else logging.DEBUG,
@@ -0,0 +1,118 @@
+import gzip
+import os
+import tempfile
+import time
+import unittest
+from queue import Queue
+from types import SimpleNamespace
+from unittest import mock
+
+import memc_load_multi
+
+
+class ReadBlocksTest(unittest.TestCase):
+
+    def read(self, data):
+        fd, fn = tempfile.mkstemp(suffix='.tsv.gz')
+        self.addCleanup(os.remove, fn)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return list(memc_load_multi.read_blocks(fn, read_size=16))
+
+    def test_lines(self):
+        data = b'idfa\t1\t55.55\t42.42\t1,2\n' * 10 + b'gaid\t2\t55.55\t42.42\t3'
+        blocks = self.read(gzip.compress(data[:100]) + gzip.compress(data[100:]))
+        self.assertEqual(b''.join(blocks), data)
+        self.assertTrue(all(block.endswith(b'\n') for block in blocks[:-1]))
+
+    def test_empty(self):
+        self.assertEqual(self.read(b''), [])
+        self.assertEqual(self.read(gzip.compress(b'')), [])
+
+    def test_truncated(self):
+        with self.assertRaises(EOFError):
+            self.read(gzip.compress(b'idfa\t1\t55.55\t42.42\t1,2\n' * 10)[:-10])
+
+
+class ParseBlockTest(unittest.TestCase):
+
+    def test_separators_inside_record(self):
+        block = 'idfa\t1\t55.55\t42.42\t1,2\ngaid\t2\x0b\x1c\u2028\t55.55\t42.42\t3\n'.encode()
+        chunks, errors = memc_load_multi.parse_block(block, ('idfa', 'gaid'))
+        self.assertEqual(errors, 0)
+        self.assertEqual([dev_type for dev_type, _ in chunks], ['idfa', 'gaid'])
+
+class StubClient:
+    # Stands for memcache.Client: stores what it is given unless the server is dead
+
+    def __init__(self, servers=('127.0.0.1:11211',)):
+        self.servers = [SimpleNamespace(address=address, deaduntil=0) for address in servers]
+        self.stored = {}
+
+    def set_multi(self, mapping, noreply=False):
+        if self.servers[0].deaduntil > time.time():
+            # Like python-memcached: keys of a dead server are skipped, noreply reports nothing
+            return [] if noreply else list(mapping)
+        self.stored.update(mapping)
+        return []
+
+    def disconnect_all(self):
+        pass
+
+
+class MemcacheWriterTest(unittest.TestCase):
+
+    def writer(self, memc, noreply):
+        return memc_load_multi.MemcacheWriter(Queue(), Queue(), memc, attempts=0, noreply=noreply)
+
+    def test_noreply(self):
+        memc = StubClient()
+        self.assertEqual(self.writer(memc, noreply=True).memcache_set(memc, {'a': b'1', 'b': b'2'}), (2, 0))
+        self.assertEqual(memc.stored, {'a': b'1', 'b': b'2'})
+
+    def test_noreply_dead_server(self):
+        memc = StubClient()
+        memc.servers[0].deaduntil = time.time() + 30
+        self.assertEqual(self.writer(memc, noreply=True).memcache_set(memc, {'a': b'1', 'b': b'2'}), (0, 2))
+
+    def test_dead_server(self):
+        memc = StubClient()
+        memc.servers[0].deaduntil = time.time() + 30
+        self.assertEqual(self.writer(memc, noreply=False).memcache_set(memc, {'a': b'1', 'b': b'2'}), (0, 2))
+
+
+class MemcachePoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clients = []
+        patcher = mock.patch.object(memc_load_multi.memcache, 'Client', side_effect=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = memc_load_multi.MemcachePool({'idfa': '127.0.0.1:33013'}, connections=2)
+        self.addCleanup(self.pool.close)
+
+    def client(self, servers):
+        client = StubClient(servers)
+        self.clients.append(client)
+        return client
+
+    def test_flush_per_file(self):
+        for key in ('a', 'b', 'c'):
+            self.pool.put('idfa', {key: b'1'})
+        self.assertEqual(self.pool.flush(), (3, 0))
+        writers = list(self.pool.writers)
+
+        self.clients[0].servers[0].deaduntil = self.clients[1].servers[0].deaduntil = time.time() + 30
+        self.pool.put('idfa', {'d': b'1'})
+        self.pool.put('idfa', {'e': b'1'})
+        self.assertEqual(self.pool.flush(), (0, 2))
+
+        # Writers and their clients are kept for the next file
+        self.assertEqual(self.pool.writers, writers)
+        self.assertTrue(all(writer.is_alive() for writer in writers))
+        self.assertEqual(len(self.clients), 2)
+        self.assertEqual({key for client in self.clients for key in client.stored}, {'a', 'b', 'c'})
+
+
+if __name__ == '__main__':
+    unittest.main()